@@ -6,6 +6,8 @@ from pathlib import Path
 import os
 from datetime import timedelta
 
+from celery.schedules import crontab
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -25,6 +27,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third party apps
     'rest_framework',
@@ -137,14 +140,68 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Периодические задачи (celery beat)
+CELERY_BEAT_SCHEDULE = {
+    'flush-product-views': {
+        'task': 'products.tasks.flush_product_views',
+        'schedule': 60.0,
+    },
+    'rebuild-similar-products': {
+        'task': 'products.tasks.rebuild_similar_products',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'update-popularity-scores': {
+        'task': 'products.tasks.update_popularity_scores',
+        'schedule': 30 * 60.0,
+    },
+    'rebuild-specification-catalog': {
+        'task': 'products.tasks.rebuild_specification_catalog',
+        'schedule': crontab(hour=3, minute=30),
+    },
+    'reconcile-category-counts': {
+        'task': 'products.tasks.reconcile_category_product_counts',
+        'schedule': crontab(minute=45),
+    },
+    'update-bought-together': {
+        'task': 'orders.tasks.update_bought_together_pairs',
+        'schedule': crontab(minute=15),
+    },
+}
+
 # Cache
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://redis:6379/1')
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-        'LOCATION': os.environ.get('REDIS_URL', 'redis://redis:6379/1'),
+        'LOCATION': REDIS_URL,
     }
 }
 
+# Просмотры товаров копятся в Redis и переносятся в БД задачей flush_product_views
+PRODUCT_VIEWS_IGNORE_BOTS = os.environ.get('PRODUCT_VIEWS_IGNORE_BOTS', 'True') == 'True'
+# Окно (сек), в течение которого повторный просмотр того же посетителя не считается; 0 — считать все
+PRODUCT_VIEWS_UNIQUE_WINDOW = int(os.environ.get('PRODUCT_VIEWS_UNIQUE_WINDOW', '1800'))
+
+# Колоночный снимок каталога (products.snapshot): фильтры и сортировка списка без запросов к БД
+CATALOG_SNAPSHOT_ENABLED = os.environ.get('CATALOG_SNAPSHOT_ENABLED', 'False') == 'True'
+CATALOG_SNAPSHOT_DIR = BASE_DIR / 'var' / 'snapshot'
+
+# Выгрузки для маркетплейсов (products.feeds)
+SITE_URL = os.environ.get('SITE_URL', 'http://localhost:3000')
+SHOP_NAME = os.environ.get('SHOP_NAME', 'KnifeShop')
+SHOP_COMPANY = os.environ.get('SHOP_COMPANY', SHOP_NAME)
+FEEDS_DIR = BASE_DIR / 'var' / 'feeds'
+
+# Счетчики совместных покупок для «покупают вместе» (orders.bought_together)
+BOUGHT_TOGETHER_STATE = BASE_DIR / 'var' / 'bought_together.npz'
+
+# Готовые файлы sitemap (products.sitemap); адреса страниц строятся от SITE_URL
+SITEMAPS_DIR = BASE_DIR / 'var' / 'sitemaps'
+
+# Файлы импорта каталога из админки до обработки задачей (products.importer)
+IMPORTS_DIR = BASE_DIR / 'var' / 'imports'
+
 # Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.yandex.ru')
@@ -4,8 +4,13 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from products.views import HomeView, SitemapView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/home/', HomeView.as_view(), name='home'),
+    path('sitemap.xml', SitemapView.as_view(), name='sitemap'),
+    path('sitemaps/<str:name>.xml', SitemapView.as_view(), name='sitemap-section'),
     path('api/products/', include('products.urls')),
     path('api/', include('orders.urls')),
     path('api/', include('reviews.urls')),  # Добавлено для отзывов
@@ -6,6 +6,11 @@ while ! nc -z $POSTGRES_HOST $POSTGRES_PORT; do
 done
 echo "PostgreSQL started"
 
+# Воркеры celery (worker/beat) передают свою команду — запускаем её без миграций и gunicorn
+if [ "$#" -gt 0 ]; then
+  exec "$@"
+fi
+
 echo "Running migrations..."
 python manage.py makemigrations
 python manage.py migrate
@@ -21,6 +26,12 @@ else:
     print('Superuser already exists')
 END
 
+echo "Building catalog snapshot..."
+python manage.py build_catalog_snapshot
+
+echo "Building sitemap..."
+python manage.py build_sitemap
+
 echo "Collecting static files..."
 python manage.py collectstatic --noinput
 
@@ -0,0 +1,210 @@
+# backend/orders/bought_together.py
+"""
+«Покупают вместе»: пары товаров из одних заказов, ранжированные по lift.
+
+Счетчики хранятся разреженно в файле состояния: сколько учтенных заказов
+содержит каждый товар и каждую пару товаров (пара — два id в одном int64),
+плюс список уже учтенных заказов. При запуске из БД читаются позиции только
+тех заказов, которые стали продажей или перестали ею быть (отмена), и их
+вклад прибавляется или вычитается. Топ-k пересчитывается для товаров,
+чьи счетчики изменились, и их партнеров по парам.
+"""
+import os
+import tempfile
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from products.models import BoughtTogether
+from products.popularity import SOLD_STATUSES
+
+from .models import Order, OrderItem
+
+
+TOP_K = 8
+# Пара из единственного совместного заказа дает случайно высокий lift
+MIN_PAIR_ORDERS = 2
+PAIR_SHIFT = 32
+PAIR_MASK = (1 << PAIR_SHIFT) - 1
+ORDERS_BATCH_SIZE = 1000
+BATCH_SIZE = 1000
+
+STATE_FIELDS = ['order_ids', 'item_ids', 'item_counts', 'pair_keys', 'pair_counts']
+
+
+def _empty():
+    return np.empty(0, dtype=np.int64)
+
+
+class CooccurrenceState:
+    """Разреженные счетчики совместных покупок и учтенные заказы"""
+    
+    def __init__(self, **arrays):
+        for name in STATE_FIELDS:
+            setattr(self, name, arrays.get(name, _empty()))
+    
+    @classmethod
+    def load(cls, path):
+        """Состояние из файла или None, если его нет (тогда нужен полный пересчет)"""
+        try:
+            with np.load(path) as data:
+                return cls(**{name: data[name] for name in STATE_FIELDS})
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+    
+    def save(self, path):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.npz')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                np.savez(tmp_file, **{name: getattr(self, name) for name in STATE_FIELDS})
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    
+    def apply(self, orders, products, signs):
+        """
+        Добавить (+1) или вычесть (-1) вклад заказов.
+        
+        orders и products — позиции заказов (товар в заказе один раз),
+        signs — знак каждой позиции. Возвращает id товаров с изменившимися счетчиками.
+        """
+        self.item_ids, self.item_counts = _merge(self.item_ids, self.item_counts, products, signs)
+        pair_keys, pair_signs = order_pairs(orders, products, signs)
+        self.pair_keys, self.pair_counts = _merge(self.pair_keys, self.pair_counts, pair_keys, pair_signs)
+        return np.unique(products)
+
+
+def _merge(keys, counts, delta_keys, delta_counts):
+    """Сложить разреженный вектор счетчиков с приращениями; нулевые счетчики удаляются"""
+    merged, inverse = np.unique(np.concatenate((keys, delta_keys)), return_inverse=True)
+    summed = np.bincount(
+        inverse,
+        weights=np.concatenate((counts, delta_counts)),
+        minlength=len(merged)
+    ).astype(np.int64)
+    keep = summed > 0
+    return merged[keep], summed[keep]
+
+
+def order_pairs(orders, products, signs):
+    """Ключи всех пар товаров внутри каждого заказа (меньший id в старших битах) и их знаки"""
+    order = np.lexsort((products, orders))
+    orders, products, signs = orders[order], products[order], signs[order]
+    
+    # Для каждой позиции — конец ее заказа; пары образуют позиции правее нее
+    starts = np.flatnonzero(np.r_[True, orders[1:] != orders[:-1]])
+    sizes = np.diff(np.r_[starts, len(orders)])
+    ends = np.repeat(starts + sizes, sizes)
+    counts = ends - np.arange(len(orders)) - 1
+    
+    left = np.repeat(np.arange(len(orders)), counts)
+    right = left + 1 + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return (products[left] << PAIR_SHIFT) | products[right], signs[left]
+
+
+def load_items(order_ids):
+    """Позиции заказов (без повторов товара в заказе) как массивы numpy"""
+    orders, products = [], []
+    for start in range(0, len(order_ids), ORDERS_BATCH_SIZE):
+        rows = OrderItem.objects.filter(
+            order_id__in=order_ids[start:start + ORDERS_BATCH_SIZE].tolist()
+        ).values_list('order_id', 'product_id').distinct()
+        for order_id, product_id in rows:
+            orders.append(order_id)
+            products.append(product_id)
+    return np.array(orders, dtype=np.int64), np.array(products, dtype=np.int64)
+
+
+def top_pairs(state, product_ids, k, min_orders=MIN_PAIR_ORDERS):
+    """Топ-k партнеров по lift для товаров product_ids: список BoughtTogether"""
+    keep = state.pair_counts >= min_orders
+    first = state.pair_keys[keep] >> PAIR_SHIFT
+    second = state.pair_keys[keep] & PAIR_MASK
+    counts = state.pair_counts[keep]
+    
+    # Пары симметричны: каждая входит в списки обоих товаров
+    sources = np.concatenate((first, second))
+    targets = np.concatenate((second, first))
+    counts = np.concatenate((counts, counts))
+    selected = np.isin(sources, product_ids)
+    sources, targets, counts = sources[selected], targets[selected], counts[selected]
+    
+    # lift = P(a и b) / (P(a) * P(b))
+    total_orders = len(state.order_ids)
+    source_counts = state.item_counts[np.searchsorted(state.item_ids, sources)]
+    target_counts = state.item_counts[np.searchsorted(state.item_ids, targets)]
+    lifts = counts * total_orders / (source_counts * target_counts)
+    
+    order = np.lexsort((targets, -counts, -lifts, sources))
+    sources, targets, counts, lifts = sources[order], targets[order], counts[order], lifts[order]
+    starts = np.flatnonzero(np.r_[True, sources[1:] != sources[:-1]]) if len(sources) else _empty()
+    ranks = np.arange(len(sources)) - np.repeat(starts, np.diff(np.r_[starts, len(sources)]))
+    
+    return [
+        BoughtTogether(
+            product_id=int(sources[i]),
+            together_id=int(targets[i]),
+            lift=float(lifts[i]),
+            orders_count=int(counts[i]),
+            rank=int(ranks[i])
+        )
+        for i in np.flatnonzero(ranks < k)
+    ]
+
+
+def update_bought_together(full=False, k=TOP_K):
+    """
+    Досчитать пары по новым и отмененным заказам и обновить топ-k затронутых товаров.
+    
+    Без файла состояния (или с full=True) история пересчитывается целиком.
+    Lift остальных товаров не переписывается: с ростом числа заказов он
+    меняется у всех пар одного товара пропорционально, и порядок не меняется.
+    Возвращает (число обработанных заказов, число товаров с новым топом).
+    """
+    path = os.fspath(settings.BOUGHT_TOGETHER_STATE)
+    state = None if full else CooccurrenceState.load(path)
+    
+    sold = np.sort(np.fromiter(
+        Order.objects.filter(status__in=SOLD_STATUSES).values_list('id', flat=True),
+        dtype=np.int64
+    ))
+    if state is not None:
+        removed = np.setdiff1d(state.order_ids, sold, assume_unique=True)
+        if Order.objects.filter(id__in=removed.tolist()).count() != len(removed):
+            # Удаленный заказ не вычесть: его позиций больше нет
+            state = None
+    
+    rebuild = state is None
+    if rebuild:
+        state = CooccurrenceState()
+        removed = _empty()
+    added = np.setdiff1d(sold, state.order_ids, assume_unique=True)
+    changed_orders = np.concatenate((added, removed))
+    if not len(changed_orders) and not rebuild:
+        return 0, 0
+    
+    orders, products = load_items(changed_orders)
+    signs = np.where(np.isin(orders, added), 1, -1).astype(np.int64)
+    changed = state.apply(orders, products, signs)
+    state.order_ids = sold
+    
+    # Новые счетчики товара меняют lift пар его партнеров
+    first = state.pair_keys >> PAIR_SHIFT
+    second = state.pair_keys & PAIR_MASK
+    partners = np.concatenate((second[np.isin(first, changed)], first[np.isin(second, changed)]))
+    affected = np.union1d(changed, partners)
+    entries = top_pairs(state, affected, k)
+    
+    with transaction.atomic():
+        if rebuild:
+            BoughtTogether.objects.all().delete()
+        else:
+            BoughtTogether.objects.filter(product_id__in=affected.tolist()).delete()
+        BoughtTogether.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+    # Состояние сохраняется после записи: при сбое изменения посчитаются заново от прежнего
+    state.save(path)
+    return len(changed_orders), len(affected)
@@ -0,0 +1,10 @@
+# backend/orders/tasks.py
+from celery import shared_task
+
+from .bought_together import update_bought_together
+
+
+@shared_task(ignore_result=True)
+def update_bought_together_pairs(full=False):
+    """Досчитать «покупают вместе» по новым и отмененным заказам"""
+    update_bought_together(full=full)
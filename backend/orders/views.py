@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.shortcuts import get_object_or_404
 from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 
 from .models import Cart, CartItem, Order, OrderItem
 from .serializers import (
@@ -17,6 +18,23 @@ from .serializers import (
 from products.models import Product
 
 
+def cart_items_queryset():
+    """Позиции корзины вместе с товаром, категорией и главным фото"""
+    return CartItem.objects.select_related('product__category', 'product__main_image')
+
+
+def cart_items_prefetch():
+    return Prefetch('items', queryset=cart_items_queryset())
+
+
+def order_items_prefetch():
+    """Позиции заказа вместе с товаром, категорией и главным фото"""
+    return Prefetch(
+        'items',
+        queryset=OrderItem.objects.select_related('product__category', 'product__main_image')
+    )
+
+
 class CartViewSet(viewsets.ViewSet):
     """ViewSet для работы с корзиной"""
     permission_classes = [AllowAny]
@@ -36,6 +54,7 @@ class CartViewSet(viewsets.ViewSet):
     def list(self, request):
         """Получить корзину"""
         cart = self.get_cart(request)
+        prefetch_related_objects([cart], cart_items_prefetch())
         serializer = CartSerializer(cart)
         return Response(serializer.data)
     
@@ -46,7 +65,10 @@ class CartViewSet(viewsets.ViewSet):
         serializer.is_valid(raise_exception=True)
         
         cart = self.get_cart(request)
-        product = get_object_or_404(Product, id=serializer.validated_data['product_id'])
+        product = get_object_or_404(
+            Product.objects.select_related('category', 'main_image'),
+            id=serializer.validated_data['product_id']
+        )
         quantity = serializer.validated_data['quantity']
         
         # Проверка наличия товара
@@ -66,6 +88,8 @@ class CartViewSet(viewsets.ViewSet):
         if not created:
             cart_item.quantity += quantity
             cart_item.save()
+        # Товар уже загружен вместе с категорией и фото — без повторных запросов при сериализации
+        cart_item.product = product
         
         return Response(
             CartItemSerializer(cart_item).data,
@@ -76,7 +100,7 @@ class CartViewSet(viewsets.ViewSet):
     def update_item(self, request, item_id=None):
         """Обновить количество товара"""
         cart = self.get_cart(request)
-        cart_item = get_object_or_404(CartItem, id=item_id, cart=cart)
+        cart_item = get_object_or_404(cart_items_queryset(), id=item_id, cart=cart)
         
         serializer = UpdateCartItemSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -86,7 +110,8 @@ class CartViewSet(viewsets.ViewSet):
         
         return Response(CartItemSerializer(cart_item).data)
     
-    @action(detail=False, methods=['delete'], url_path='items/(?P<item_id>[^/.]+)')
+    # Тот же адрес, что у update_item: отдельное действие с тем же url_path перекрывалось бы первым
+    @update_item.mapping.delete
     def remove_item(self, request, item_id=None):
         """Удалить товар из корзины"""
         cart = self.get_cart(request)
@@ -110,13 +135,14 @@ class OrderViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Получить заказы текущего пользователя или по email для гостей"""
+        queryset = Order.objects.prefetch_related(order_items_prefetch())
         if self.request.user.is_authenticated:
-            return Order.objects.filter(user=self.request.user)
+            return queryset.filter(user=self.request.user)
         
         # Для гостей - фильтр по email (требуется передать в query params)
         email = self.request.query_params.get('email')
         if email:
-            return Order.objects.filter(email=email, user__isnull=True)
+            return queryset.filter(email=email, user__isnull=True)
         
         return Order.objects.none()
     
@@ -171,7 +197,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         )
         
         # Создать позиции заказа из корзины
-        for cart_item in cart.items.all():
+        for cart_item in cart.items.select_related('product'):
             OrderItem.objects.create(
                 order=order,
                 product=cart_item.product,
@@ -183,6 +209,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         cart.clear()
         
         # Вернуть созданный заказ
+        prefetch_related_objects([order], order_items_prefetch())
         order_serializer = OrderSerializer(order)
         return Response(order_serializer.data, status=status.HTTP_201_CREATED)
     
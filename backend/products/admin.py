@@ -1,7 +1,62 @@
 # backend/products/admin.py - ПОЛНАЯ ВЕРСИЯ
-from django.contrib import admin
+import os
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.db import transaction
+from django.shortcuts import redirect, render
+from django.urls import path
 from django.utils.html import format_html
-from .models import Category, Product, ProductImage
+from .category_counts import reconcile_category_counts
+from .detail import invalidate_product_details
+from .importer import (
+    IMPORT_EXTENSIONS,
+    JOB_DONE,
+    JOB_FAILED,
+    get_import_job,
+    start_import_job
+)
+from .models import Category, PriceHistory, Product, ProductImage, SpecificationOption
+from .pricing import REPRICE_MODES, REPRICE_PERCENT, reprice, reprice_error
+
+
+class CatalogImportForm(forms.Form):
+    file = forms.FileField(label='Файл CSV или XLSX')
+    dry_run = forms.BooleanField(
+        label='Только показать изменения',
+        required=False,
+        initial=True
+    )
+    download_images = forms.BooleanField(
+        label='Скачать фото из колонки images',
+        required=False,
+        initial=True
+    )
+
+
+class RepriceForm(forms.Form):
+    """Параметры действия «Изменить цены» (остальные действия их не используют)"""
+    price_mode = forms.ChoiceField(label='Изменить цену', choices=REPRICE_MODES, required=False)
+    price_value = forms.DecimalField(label='на', max_digits=12, decimal_places=2, required=False)
+    price_reason = forms.CharField(label='Причина', max_length=255, required=False)
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        # Режим по умолчанию — процент; пустое значение проверяет само действие
+        cleaned_data['price_mode'] = cleaned_data.get('price_mode') or REPRICE_PERCENT
+        value = cleaned_data.get('price_value')
+        if value is not None:
+            error = reprice_error(cleaned_data['price_mode'], value)
+            if error:
+                self.add_error('price_value', error)
+        return cleaned_data
+
+
+class RepriceActionForm(ActionForm, RepriceForm):
+    def clean(self):
+        # Форма общая для всех действий: параметры цены проверяет само действие
+        return forms.Form.clean(self)
 
 
 class ProductImageInline(admin.TabularInline):
@@ -20,15 +75,18 @@ class ProductImageInline(admin.TabularInline):
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'parent', 'order', 'product_count']
+    list_display = [
+        'name',
+        'parent',
+        'order',
+        'products_count',
+        'subtree_products_count',
+        'subtree_in_stock_count'
+    ]
     list_filter = ['parent']
     search_fields = ['name']
     prepopulated_fields = {'slug': ('name',)}
     ordering = ['order', 'name']
-    
-    def product_count(self, obj):
-        return obj.products.count()
-    product_count.short_description = 'Товаров'
 
 
 @admin.register(Product)
@@ -46,14 +104,24 @@ class ProductAdmin(admin.ModelAdmin):
         'created_at'
     ]
     list_filter = ['stock_status', 'category', 'is_featured', 'is_new', 'created_at']
-    search_fields = ['name', 'description', 'blade_material', 'handle_material']
+    list_select_related = ['category', 'main_image']
+    search_fields = ['name', 'sku', 'description', 'blade_material', 'handle_material']
     prepopulated_fields = {'slug': ('name',)}
-    readonly_fields = ['views_count', 'average_rating', 'created_at', 'updated_at']
+    readonly_fields = [
+        'views_count',
+        'average_rating',
+        'rating_count',
+        'rating_breakdown',
+        'popularity_score',
+        'created_at',
+        'updated_at'
+    ]
     inlines = [ProductImageInline]
+    change_list_template = 'admin/products/product/change_list.html'
     
     fieldsets = (
         ('Основная информация', {
-            'fields': ('name', 'slug', 'description', 'category', 'price')
+            'fields': ('name', 'slug', 'sku', 'description', 'category', 'price')
         }),
         ('Характеристики', {
             'fields': (
@@ -71,17 +139,86 @@ class ProductAdmin(admin.ModelAdmin):
             'fields': ('stock_status', 'is_featured', 'is_new')
         }),
         ('Метрики', {
-            'fields': ('views_count', 'average_rating', 'created_at', 'updated_at'),
+            'fields': (
+                'views_count',
+                'average_rating',
+                'rating_count',
+                'rating_breakdown',
+                'popularity_score',
+                'created_at',
+                'updated_at'
+            ),
             'classes': ('collapse',)
         }),
     )
     
-    actions = ['mark_as_featured', 'mark_as_in_stock']
+    actions = ['mark_as_featured', 'mark_as_in_stock', 'reprice_products']
+    action_form = RepriceActionForm
+    
+    def get_urls(self):
+        urls = [
+            path(
+                'import/',
+                self.admin_site.admin_view(self.import_catalog_view),
+                name='products_product_import'
+            ),
+            path(
+                'import/<str:job_id>/',
+                self.admin_site.admin_view(self.import_status_view),
+                name='products_product_import_status'
+            ),
+        ]
+        return urls + super().get_urls()
+    
+    def import_catalog_view(self, request):
+        """Загрузка файла каталога: сначала проверка, затем запись (в фоновой задаче)"""
+        if not self.has_add_permission(request) or not self.has_change_permission(request):
+            return redirect('admin:products_product_changelist')
+        
+        form = CatalogImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            extension = os.path.splitext(upload.name)[1].lower()
+            if extension not in IMPORT_EXTENSIONS:
+                form.add_error('file', f'Неподдерживаемый формат файла: {extension or upload.name}')
+            else:
+                job_id = start_import_job(
+                    upload,
+                    dry_run=form.cleaned_data['dry_run'],
+                    download_images=form.cleaned_data['download_images']
+                )
+                return redirect('admin:products_product_import_status', job_id=job_id)
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Импорт каталога',
+            'opts': self.model._meta,
+            'form': form,
+        }
+        return render(request, 'admin/products/product/import_catalog.html', context)
+    
+    def import_status_view(self, request, job_id):
+        """Состояние импорта; страница обновляется, пока задача не завершится"""
+        if not self.has_add_permission(request) or not self.has_change_permission(request):
+            return redirect('admin:products_product_changelist')
+        
+        job = get_import_job(job_id)
+        if job is None:
+            self.message_user(request, 'Импорт не найден или его отчет устарел', messages.WARNING)
+            return redirect('admin:products_product_import')
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Импорт каталога',
+            'opts': self.model._meta,
+            'job': job,
+            'finished': job['state'] in (JOB_DONE, JOB_FAILED),
+            'report': job.get('report'),
+        }
+        return render(request, 'admin/products/product/import_status.html', context)
     
     def thumbnail(self, obj):
-        main_image = obj.images.filter(is_main=True).first()
-        if not main_image:
-            main_image = obj.images.first()
+        main_image = obj.main_image
         if main_image:
             return format_html(
                 '<img src="{}" width="50" height="50" style="object-fit: cover;" />',
@@ -90,6 +227,12 @@ class ProductAdmin(admin.ModelAdmin):
         return '-'
     thumbnail.short_description = 'Фото'
     
+    def rating_breakdown(self, obj):
+        return ' · '.join(
+            f'{stars}★: {count}' for stars, count in reversed(obj.rating_distribution.items())
+        )
+    rating_breakdown.short_description = 'Оценки по звездам'
+    
     def stock_status_badge(self, obj):
         colors = {
             'in_stock': '#28a745',
@@ -109,14 +252,52 @@ class ProductAdmin(admin.ModelAdmin):
     stock_status_badge.short_description = 'Наличие'
     
     def mark_as_featured(self, request, queryset):
-        updated = queryset.update(is_featured=True)
+        updated = self.update_products(queryset, is_featured=True)
         self.message_user(request, f'{updated} товаров добавлено в слайдер')
     mark_as_featured.short_description = 'Добавить в слайдер на главной'
     
     def mark_as_in_stock(self, request, queryset):
-        updated = queryset.update(stock_status='in_stock')
+        updated = self.update_products(queryset, stock_status='in_stock')
         self.message_user(request, f'{updated} товаров отмечено как "В наличии"')
     mark_as_in_stock.short_description = 'Отметить как "В наличии"'
+    
+    def reprice_products(self, request, queryset):
+        # Поле action заполняется только в списке, поэтому проверяются лишь параметры цены
+        form = RepriceForm(request.POST)
+        if form.is_valid() and form.cleaned_data['price_value'] is None:
+            form.add_error('price_value', 'Укажите, на сколько изменить цену')
+        if not form.is_valid():
+            for errors in form.errors.values():
+                for error in errors:
+                    self.message_user(request, error, messages.ERROR)
+            return
+        data = form.cleaned_data
+        updated = reprice(
+            queryset,
+            data['price_mode'],
+            data['price_value'],
+            user=request.user,
+            reason=data['price_reason']
+        )
+        self.message_user(request, f'Цена изменена у {updated} товаров')
+    reprice_products.short_description = 'Изменить цены (на процент или сумму)'
+    
+    def save_model(self, request, obj, form, change):
+        # Автор изменения цены для истории цен (см. signals.product_price_changed)
+        obj._changed_by = request.user
+        super().save_model(request, obj, form, change)
+    
+    @transaction.atomic
+    def update_products(self, queryset, **values):
+        """queryset.update() обходит сигналы: кэши каталога и страниц товаров сбрасываются вручную"""
+        from .signals import catalog_committed
+        
+        invalidate_product_details(queryset.values_list('slug', flat=True))
+        updated = queryset.update(**values)
+        if 'stock_status' in values:
+            reconcile_category_counts()
+        transaction.on_commit(catalog_committed)
+        return updated
 
 
 @admin.register(ProductImage)
@@ -128,4 +309,27 @@ class ProductImageAdmin(admin.ModelAdmin):
         if obj.image:
             return format_html('<img src="{}" width="100" height="100" style="object-fit: cover;" />', obj.image.url)
         return '-'
-    image_preview.short_description = 'Превью'
\ No newline at end of file
+    image_preview.short_description = 'Превью'
+
+
+@admin.register(SpecificationOption)
+class SpecificationOptionAdmin(admin.ModelAdmin):
+    list_display = ['key', 'value']
+    list_filter = ['key']
+    search_fields = ['key', 'value']
+
+
+@admin.register(PriceHistory)
+class PriceHistoryAdmin(admin.ModelAdmin):
+    list_display = ['product', 'old_price', 'new_price', 'reason', 'changed_by', 'changed_at']
+    list_filter = ['changed_at']
+    list_select_related = ['product', 'changed_by']
+    search_fields = ['product__name', 'product__sku', 'reason']
+    raw_id_fields = ['product']
+    date_hierarchy = 'changed_at'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,10 @@
+# backend/products/apps.py
+from django.apps import AppConfig
+
+class ProductsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'products'
+    verbose_name = 'Каталог'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
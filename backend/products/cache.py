@@ -0,0 +1,71 @@
+# backend/products/cache.py
+"""Ключи кэша каталога и их инвалидация"""
+import hashlib
+import logging
+import time
+
+from django.core.cache import cache
+
+
+logger = logging.getLogger(__name__)
+
+
+CATALOG_VERSION_KEY = 'catalog:version'
+CATEGORIES_VERSION_KEY = 'catalog:categories:version'
+
+
+def get_version(key):
+    """Текущее значение счетчика версии"""
+    version = cache.get(key)
+    if version is None:
+        # Начальная версия от времени, чтобы не совпасть с ключами до вытеснения
+        cache.add(key, int(time.time()), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """Сделать устаревшим всё, что закэшировано под прежней версией"""
+    try:
+        cache.incr(key)
+    except ValueError:
+        get_version(key)
+
+
+def get_catalog_version():
+    """Версия каталога, меняется при любом изменении товаров и категорий"""
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    bump_version(CATALOG_VERSION_KEY)
+
+
+def get_categories_version():
+    """Версия дерева категорий (входит в каждый ответ с вложенной категорией)"""
+    return get_version(CATEGORIES_VERSION_KEY)
+
+
+def bump_categories_version():
+    bump_version(CATEGORIES_VERSION_KEY)
+
+
+def catalog_cache_key(prefix, *parts):
+    """Ключ кэша, привязанный к текущей версии каталога"""
+    digest = hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'catalog:{get_catalog_version()}:{prefix}:{digest}'
+
+
+def schedule_rebuild(task, lock_key, countdown=5, lock_timeout=60):
+    """
+    Поставить задачу пересборки в очередь не чаще одного раза на серию изменений.
+    
+    Задача сама снимает блокировку lock_key перед пересборкой.
+    """
+    if not cache.add(lock_key, 1, timeout=lock_timeout):
+        return
+    try:
+        task.apply_async(countdown=countdown)
+    except Exception:
+        cache.delete(lock_key)
+        logger.warning('Не удалось поставить задачу %s в очередь', task.name, exc_info=True)
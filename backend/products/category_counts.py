@@ -0,0 +1,124 @@
+# backend/products/category_counts.py
+"""
+Счетчики товаров в категориях: прямые и по поддереву, всего и в наличии.
+
+Сигналы товара сдвигают счетчики через F() у категории и всех её предков,
+массовые операции и периодическая задача сверяют их с БД одним
+группирующим запросом.
+"""
+from collections import Counter
+
+from django.db.models import Case, Count, F, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Category, Product
+
+
+IN_STOCK = 'in_stock'
+COUNT_FIELDS = ['products_count', 'in_stock_count', 'subtree_products_count', 'subtree_in_stock_count']
+
+
+def path_ids(path):
+    return [int(pk) for pk in path.split('/') if pk]
+
+
+def adjust_category_counts(changes):
+    """
+    Сдвинуть счетчики по изменениям [(category_id, stock_status, +1 или -1), ...].
+    
+    Прямые счетчики меняются у самой категории, счетчики поддерева — у неё
+    и всех предков; всё одним UPDATE.
+    """
+    paths = dict(
+        Category.objects.filter(pk__in={category_id for category_id, _, _ in changes}).values_list('id', 'path')
+    )
+    deltas = {field: Counter() for field in COUNT_FIELDS}
+    for category_id, stock_status, sign in changes:
+        if category_id not in paths:
+            continue
+        in_stock = sign if stock_status == IN_STOCK else 0
+        deltas['products_count'][category_id] += sign
+        deltas['in_stock_count'][category_id] += in_stock
+        for pk in path_ids(paths[category_id]):
+            deltas['subtree_products_count'][pk] += sign
+            deltas['subtree_in_stock_count'][pk] += in_stock
+    
+    values = {}
+    ids = set()
+    for field, counter in deltas.items():
+        counter = {pk: delta for pk, delta in counter.items() if delta}
+        if counter:
+            increments = Case(
+                *[When(pk=pk, then=Value(delta)) for pk, delta in counter.items()],
+                default=Value(0),
+                output_field=IntegerField()
+            )
+            # Расхождение (если счетчики разошлись с БД) исправит сверка, а не ошибка CHECK
+            values[field] = Greatest(F(field) + increments, Value(0))
+            ids.update(counter)
+    if values:
+        # updated_at — для ETag дерева категорий
+        Category.objects.filter(pk__in=ids).update(**values, updated_at=timezone.now())
+
+
+def move_category_counts(category_id, old_ancestor_ids, new_ancestor_ids):
+    """Перенести счетчики поддерева категории от старых предков к новым (при смене родителя)"""
+    # Общие предки не меняются
+    left = set(old_ancestor_ids).difference(new_ancestor_ids)
+    joined = set(new_ancestor_ids).difference(old_ancestor_ids)
+    subtree = Category.objects.filter(pk=category_id).values(
+        'subtree_products_count', 'subtree_in_stock_count'
+    ).first()
+    if subtree is None or not (left or joined):
+        return
+    
+    values = {}
+    for field, count in subtree.items():
+        if count:
+            increments = Case(
+                *[When(pk=pk, then=Value(-count)) for pk in left],
+                *[When(pk=pk, then=Value(count)) for pk in joined],
+                default=Value(0),
+                output_field=IntegerField()
+            )
+            values[field] = Greatest(F(field) + increments, Value(0))
+    if values:
+        Category.objects.filter(pk__in=left | joined).update(
+            **values,
+            updated_at=timezone.now()
+        )
+
+
+def reconcile_category_counts():
+    """Пересчитать счетчики всех категорий одним группирующим запросом; возвращает число исправленных"""
+    direct = {
+        row['category_id']: (row['total'], row['in_stock'])
+        for row in Product.objects.order_by().values('category_id').annotate(
+            total=Count('id'),
+            in_stock=Count('id', filter=Q(stock_status=IN_STOCK))
+        )
+    }
+    
+    categories = list(Category.objects.only('id', 'path', *COUNT_FIELDS))
+    expected = {category.id: [0, 0, 0, 0] for category in categories}
+    for category in categories:
+        total, in_stock = direct.get(category.id, (0, 0))
+        expected[category.id][0] = total
+        expected[category.id][1] = in_stock
+        for pk in path_ids(category.path):
+            if pk in expected:
+                expected[pk][2] += total
+                expected[pk][3] += in_stock
+    
+    now = timezone.now()
+    changed = []
+    for category in categories:
+        values = expected[category.id]
+        if [getattr(category, field) for field in COUNT_FIELDS] != values:
+            for field, value in zip(COUNT_FIELDS, values):
+                setattr(category, field, value)
+            category.updated_at = now
+            changed.append(category)
+    Category.objects.bulk_update(changed, COUNT_FIELDS + ['updated_at'])
+    return len(changed)
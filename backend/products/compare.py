@@ -0,0 +1,97 @@
+# backend/products/compare.py
+"""
+Сравнение товаров: выровненная таблица характеристик с отметкой различий.
+
+Таблица строится одним запросом и кэшируется по отсортированному набору id,
+поэтому ?ids=3,1 и ?ids=1,3 используют одну запись кэша; порядок колонок
+восстанавливается под запрос при ответе.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+
+from .cache import catalog_cache_key
+from .models import Product
+from .projections import LIST_FIELDS, ProductListProjection
+
+
+# Поля товара в строках сравнения (подписи — verbose_name модели)
+COMPARE_FIELDS = [
+    'price',
+    'blade_length',
+    'total_length',
+    'weight',
+    'blade_thickness',
+    'hardness',
+    'blade_material',
+    'handle_material',
+    'stock_status',
+    'average_rating',
+]
+SPEC_KEY_PREFIX = 'spec.'
+
+COMPARE_CACHE_TIMEOUT = 60 * 60
+
+
+def _value(value):
+    # Decimal отдается строкой, как в остальном API
+    if isinstance(value, Decimal):
+        return str(value)
+    if value == '':
+        return None
+    return value
+
+
+def _row(key, label, values):
+    return {
+        'key': key,
+        'label': label,
+        'values': values,
+        'differs': len({repr(value) for value in values}) > 1,
+    }
+
+
+def build_comparison(request, product_ids):
+    """Карточки товаров и строки характеристик в порядке id (без отсутствующих товаров)"""
+    projection = ProductListProjection(request, fields=list(LIST_FIELDS), absolute_urls=False)
+    queryset = Product.objects.filter(pk__in=product_ids).order_by('id')
+    rows = list(projection.values(queryset, *COMPARE_FIELDS, 'specifications'))
+    
+    attributes = [
+        _row(field, str(Product._meta.get_field(field).verbose_name), [_value(row[field]) for row in rows])
+        for field in COMPARE_FIELDS
+    ]
+    # Ключи характеристик объединяются по всем товарам; у кого ключа нет — None
+    spec_keys = sorted({key for row in rows for key in (row['specifications'] or {})})
+    attributes += [
+        _row(
+            f'{SPEC_KEY_PREFIX}{key}',
+            key,
+            [_value((row['specifications'] or {}).get(key)) for row in rows]
+        )
+        for key in spec_keys
+    ]
+    return {
+        'products': projection.serialize(rows),
+        'attributes': attributes,
+    }
+
+
+def get_comparison(request, product_ids):
+    """Таблица сравнения из кэша, колонки в порядке product_ids"""
+    sorted_ids = sorted(set(product_ids))
+    cache_key = catalog_cache_key('compare', ','.join(map(str, sorted_ids)))
+    comparison = cache.get(cache_key)
+    if comparison is None:
+        comparison = build_comparison(request, sorted_ids)
+        cache.set(cache_key, comparison, COMPARE_CACHE_TIMEOUT)
+    
+    positions = {product['id']: index for index, product in enumerate(comparison['products'])}
+    order = [positions[pk] for pk in dict.fromkeys(product_ids) if pk in positions]
+    return {
+        'products': [comparison['products'][index] for index in order],
+        'attributes': [
+            {**row, 'values': [row['values'][index] for index in order]}
+            for row in comparison['attributes']
+        ],
+    }
@@ -0,0 +1,33 @@
+# backend/products/conditional.py
+"""Условные GET-запросы (ETag / Last-Modified) для API каталога"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    """ETag из частей, определяющих содержимое ответа"""
+    digest = hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def not_modified_response(request, etag=None, last_modified=None):
+    """Ответ 304, если у клиента актуальная версия; иначе None"""
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag=None, last_modified=None):
+    """Проставить ETag и Last-Modified в ответ"""
+    if etag:
+        response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
@@ -0,0 +1,208 @@
+# backend/products/counters.py
+"""Счетчики просмотров и недавно просмотренные товары в Redis (без записи в БД)"""
+import logging
+import re
+import time
+import uuid
+
+import redis
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+VIEWS_PENDING_KEY = 'products:views:pending'
+VIEWS_FLUSHING_KEY = 'products:views:flushing'
+VIEWS_SEEN_KEY = 'products:views:seen:{visitor}:{product_id}'
+# Значения Product.views_count после последнего переноса (для страницы товара без запроса к БД)
+VIEWS_COUNT_KEY = 'products:views:count'
+
+# Недавно просмотренные: sorted set «id товара → время просмотра», не длиннее лимита
+RECENTLY_VIEWED_KEY = 'products:recent:{owner}'
+RECENTLY_VIEWED_LIMIT = 20
+RECENTLY_VIEWED_TTL = 60 * 60 * 24 * 30
+
+# Анонимный посетитель узнается по cookie: сессия в БД ради истории просмотров не создается
+VISITOR_COOKIE = 'visitor_id'
+VISITOR_COOKIE_MAX_AGE = RECENTLY_VIEWED_TTL
+VISITOR_ID_RE = re.compile(r'[0-9a-f]{32}')
+
+BOT_USER_AGENT_RE = re.compile(r'bot|crawl|spider|slurp|preview|curl|wget|python-requests', re.I)
+
+_connection = None
+
+
+def get_redis():
+    """Общее подключение к Redis (тот же сервер, что и кэш)"""
+    global _connection
+    if _connection is None:
+        _connection = redis.Redis.from_url(settings.REDIS_URL)
+    return _connection
+
+
+def get_visitor_id(request):
+    """Идентификатор посетителя: пользователь, сессия или IP"""
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    session_key = request.session.session_key
+    if session_key:
+        return f'session:{session_key}'
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def get_anonymous_visitor(request):
+    """Id анонимного посетителя из cookie или None"""
+    visitor = request.COOKIES.get(VISITOR_COOKIE, '')
+    return visitor if VISITOR_ID_RE.fullmatch(visitor) else None
+
+
+def get_history_owner(request, create=False):
+    """Владелец истории просмотров: пользователь или анонимный посетитель из cookie"""
+    if request.user.is_authenticated:
+        # API не вызывает login(), поэтому история, накопленная до входа, переносится
+        # при первом запросе пользователя с cookie посетителя; cookie удалит remember_visitor
+        visitor = get_anonymous_visitor(request)
+        if visitor and not getattr(request, 'visitor_merged', False):
+            merge_recently_viewed(visitor, request.user)
+            request.visitor_merged = True
+        return f'user:{request.user.pk}'
+    visitor = get_anonymous_visitor(request) or getattr(request, 'new_visitor_id', None)
+    if visitor is None and create:
+        # Cookie выставит remember_visitor при ответе
+        visitor = request.new_visitor_id = uuid.uuid4().hex
+    return f'visitor:{visitor}' if visitor else None
+
+
+def remember_visitor(request, response):
+    """Выставить cookie посетителя, если его id создан в этом запросе (или удалить после переноса)"""
+    if getattr(request, 'visitor_merged', False):
+        response.delete_cookie(VISITOR_COOKIE, samesite='Lax')
+        return response
+    visitor = getattr(request, 'new_visitor_id', None)
+    if visitor:
+        response.set_cookie(
+            VISITOR_COOKIE,
+            visitor,
+            max_age=VISITOR_COOKIE_MAX_AGE,
+            secure=settings.SESSION_COOKIE_SECURE,
+            httponly=True,
+            samesite='Lax'
+        )
+    return response
+
+
+def record_view(request, product_id):
+    """
+    Учесть просмотр товара и добавить его в недавно просмотренные.
+    
+    В БД просмотр попадет при следующем сбросе счетчиков; история
+    живет только в Redis (один pipeline на запрос, плюс инкремент счетчика).
+    """
+    if settings.PRODUCT_VIEWS_IGNORE_BOTS:
+        if BOT_USER_AGENT_RE.search(request.META.get('HTTP_USER_AGENT', '')):
+            return
+    
+    try:
+        connection = get_redis()
+        recent_key = RECENTLY_VIEWED_KEY.format(owner=get_history_owner(request, create=True))
+        window = settings.PRODUCT_VIEWS_UNIQUE_WINDOW
+        
+        pipeline = connection.pipeline(transaction=False)
+        pipeline.zadd(recent_key, {product_id: time.time()})
+        pipeline.zremrangebyrank(recent_key, 0, -RECENTLY_VIEWED_LIMIT - 1)
+        pipeline.expire(recent_key, RECENTLY_VIEWED_TTL)
+        if window:
+            seen_key = VIEWS_SEEN_KEY.format(visitor=get_visitor_id(request), product_id=product_id)
+            pipeline.set(seen_key, 1, nx=True, ex=window)
+        results = pipeline.execute()
+        
+        if not window or results[-1]:
+            connection.hincrby(VIEWS_PENDING_KEY, product_id, 1)
+    except redis.RedisError:
+        logger.warning('Не удалось учесть просмотр товара %s', product_id, exc_info=True)
+
+
+def get_recently_viewed(request, limit=RECENTLY_VIEWED_LIMIT):
+    """Id недавно просмотренных товаров, последние первыми"""
+    owner = get_history_owner(request)
+    if owner is None:
+        return []
+    try:
+        ids = get_redis().zrevrange(RECENTLY_VIEWED_KEY.format(owner=owner), 0, limit - 1)
+    except redis.RedisError:
+        logger.warning('Не удалось прочитать недавно просмотренные товары', exc_info=True)
+        return []
+    return [int(product_id) for product_id in ids]
+
+
+def merge_recently_viewed(visitor, user):
+    """Перенести историю анонимного посетителя в историю пользователя (при входе)"""
+    anonymous_key = RECENTLY_VIEWED_KEY.format(owner=f'visitor:{visitor}')
+    user_key = RECENTLY_VIEWED_KEY.format(owner=f'user:{user.pk}')
+    try:
+        connection = get_redis()
+        pipeline = connection.pipeline()
+        # При совпадении товара остается более позднее время просмотра
+        pipeline.zunionstore(user_key, [user_key, anonymous_key], aggregate='MAX')
+        pipeline.zremrangebyrank(user_key, 0, -RECENTLY_VIEWED_LIMIT - 1)
+        pipeline.expire(user_key, RECENTLY_VIEWED_TTL)
+        pipeline.delete(anonymous_key)
+        pipeline.execute()
+    except redis.RedisError:
+        logger.warning('Не удалось перенести историю просмотров посетителя', exc_info=True)
+
+
+def pop_pending_views():
+    """
+    Забрать накопленные просмотры {product_id: count}.
+    
+    Счетчики переносятся в отдельный ключ и удаляются только после
+    подтверждения (ack_pending_views), поэтому при сбое записи в БД
+    они будут обработаны при следующем запуске.
+    """
+    connection = get_redis()
+    if not connection.exists(VIEWS_FLUSHING_KEY):
+        try:
+            connection.rename(VIEWS_PENDING_KEY, VIEWS_FLUSHING_KEY)
+        except redis.ResponseError:
+            # Новых просмотров нет
+            return {}
+    return {
+        int(product_id): int(count)
+        for product_id, count in connection.hgetall(VIEWS_FLUSHING_KEY).items()
+    }
+
+
+def ack_pending_views(totals=None):
+    """
+    Подтвердить перенос просмотров в БД.
+    
+    totals — новые значения views_count перенесенных товаров; они
+    записываются вместе с удалением перенесенных счетчиков (MULTI),
+    чтобы get_view_count не учел просмотры дважды.
+    """
+    pipeline = get_redis().pipeline()
+    if totals:
+        pipeline.hset(VIEWS_COUNT_KEY, mapping=totals)
+    pipeline.delete(VIEWS_FLUSHING_KEY)
+    pipeline.execute()
+
+
+def get_view_count(product_id, stored):
+    """
+    Текущее число просмотров товара без запроса к БД.
+    
+    stored — views_count на момент сборки закэшированной страницы; к
+    большему из него и последнего перенесенного значения добавляются
+    еще не перенесенные просмотры.
+    """
+    try:
+        pipeline = get_redis().pipeline(transaction=False)
+        pipeline.hget(VIEWS_COUNT_KEY, product_id)
+        pipeline.hget(VIEWS_FLUSHING_KEY, product_id)
+        pipeline.hget(VIEWS_PENDING_KEY, product_id)
+        total, flushing, pending = (int(value or 0) for value in pipeline.execute())
+    except redis.RedisError:
+        logger.warning('Не удалось прочитать просмотры товара %s', product_id, exc_info=True)
+        return stored
+    return max(stored, total) + flushing + pending
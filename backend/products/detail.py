@@ -0,0 +1,80 @@
+# backend/products/detail.py
+"""Закэшированная страница товара; сбрасывается сигналами только для затронутых товаров"""
+import json
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .conditional import make_etag
+from .models import Product
+from .serializers import ProductDetailSerializer
+
+
+# v2: views_count хранится отдельно от данных страницы и не входит в ETag
+DETAIL_CACHE_KEY = 'products:detail:v2:{slug}'
+DETAIL_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def build_product_detail(slug):
+    """
+    Данные страницы товара вместе с валидаторами для условных запросов.
+    
+    Сериализуется без запроса, поэтому URL изображений относительные —
+    представление дополняет их хостом при ответе.
+    """
+    product = Product.objects.select_related('category', 'main_image').prefetch_related(
+        'images'
+    ).filter(slug=slug).first()
+    if product is None:
+        return None
+    
+    data = dict(ProductDetailSerializer(product).data)
+    # Просмотры меняются постоянно: счетчик подставляется при ответе (counters.get_view_count)
+    views_count = data.pop('views_count')
+    return {
+        'id': product.id,
+        'updated_at': product.updated_at,
+        'etag': make_etag('product', json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder)),
+        'data': data,
+        'views_count': views_count,
+    }
+
+
+def get_product_detail(slug):
+    """Данные страницы товара из кэша; строятся при промахе"""
+    cache_key = DETAIL_CACHE_KEY.format(slug=slug)
+    detail = cache.get(cache_key)
+    if detail is None:
+        detail = build_product_detail(slug)
+        if detail is not None:
+            cache.set(cache_key, detail, DETAIL_CACHE_TIMEOUT)
+    return detail
+
+
+def invalidate_product_details(slugs):
+    """Сбросить кэш страниц товаров после фиксации транзакции"""
+    keys = [DETAIL_CACHE_KEY.format(slug=slug) for slug in set(slugs) if slug]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_category_products(*paths):
+    """
+    Сбросить страницы товаров, в которых видна категория с путем из paths.
+    
+    Вложенная категория товара показывает своих детей, поэтому изменение
+    категории затрагивает товары её самой и всех её предков.
+    """
+    category_ids = {int(pk) for path in paths if path for pk in path.split('/') if pk}
+    if category_ids:
+        invalidate_product_details(
+            Product.objects.filter(category_id__in=category_ids).values_list('slug', flat=True)
+        )
+
+
+def invalidate_product_details_by_id(product_ids):
+    """Сбросить кэш страниц товаров по их id"""
+    invalidate_product_details(
+        Product.objects.filter(pk__in=list(product_ids)).values_list('slug', flat=True)
+    )
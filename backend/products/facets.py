@@ -0,0 +1,176 @@
+# backend/products/facets.py
+"""Счетчики для фильтров каталога (фасеты)"""
+from django.db import connection
+from django.db.models import Count, Max, Min, Q
+
+from .models import Category, Product, SpecificationOption
+
+
+RANGE_FIELDS = ['price', 'blade_length', 'total_length', 'weight']
+VALUE_FIELDS = ['blade_material', 'handle_material']
+
+
+def build_facets(queryset, bins=10, filtered=True):
+    """
+    Фасеты по отфильтрованной выборке товаров за несколько сгруппированных запросов.
+    
+    Для всего каталога (filtered=False) счетчики категорий берутся из Category.
+    """
+    queryset = queryset.order_by()
+    
+    aggregates = {'count': Count('id')}
+    for field in RANGE_FIELDS:
+        aggregates[f'{field}__min'] = Min(field)
+        aggregates[f'{field}__max'] = Max(field)
+    totals = queryset.aggregate(**aggregates)
+    
+    return {
+        'count': totals['count'],
+        'stock_status': _stock_status_counts(queryset),
+        **{field: _value_counts(queryset, field) for field in VALUE_FIELDS},
+        'categories': _category_counts(queryset) if filtered else _catalog_category_counts(),
+        'specifications': _specification_counts(queryset),
+        'ranges': _ranges(queryset, totals, bins),
+    }
+
+
+def _stock_status_counts(queryset):
+    labels = dict(Product.STOCK_STATUS_CHOICES)
+    rows = queryset.values('stock_status').annotate(count=Count('id'))
+    counts = {row['stock_status']: row['count'] for row in rows}
+    return [
+        {'value': value, 'label': label, 'count': counts.get(value, 0)}
+        for value, label in labels.items()
+    ]
+
+
+def _value_counts(queryset, field):
+    rows = queryset.exclude(**{field: ''}).values(field).annotate(
+        count=Count('id')
+    ).order_by('-count', field)
+    return [{'value': row[field], 'count': row['count']} for row in rows]
+
+
+def _category_counts(queryset):
+    """Количество товаров по категориям с учетом подкатегорий"""
+    direct = dict(
+        queryset.values_list('category_id').annotate(count=Count('id'))
+    )
+    if not direct:
+        return []
+    
+    categories = list(Category.objects.values('id', 'name', 'slug', 'parent_id', 'path'))
+    totals = dict.fromkeys((category['id'] for category in categories), 0)
+    for category in categories:
+        count = direct.get(category['id'], 0)
+        if count:
+            for ancestor_id in category['path'].split('/'):
+                if ancestor_id:
+                    totals[int(ancestor_id)] += count
+    
+    return [
+        {
+            'id': category['id'],
+            'name': category['name'],
+            'slug': category['slug'],
+            'parent': category['parent_id'],
+            'count': totals[category['id']],
+        }
+        for category in categories
+        if totals[category['id']]
+    ]
+
+
+def _catalog_category_counts():
+    """Счетчики категорий всего каталога из денормализованных полей (см. category_counts)"""
+    categories = Category.objects.filter(subtree_products_count__gt=0).values(
+        'id', 'name', 'slug', 'parent_id', 'subtree_products_count'
+    )
+    return [
+        {
+            'id': category['id'],
+            'name': category['name'],
+            'slug': category['slug'],
+            'parent': category['parent_id'],
+            'count': category['subtree_products_count'],
+        }
+        for category in categories
+    ]
+
+
+def _specification_counts(queryset):
+    """
+    Значения дополнительных характеристик из справочника со счетчиками.
+    
+    Один группирующий запрос по парам jsonb_each_text отобранных товаров;
+    соединение со справочником оставляет только значения, доступные в фильтре.
+    """
+    products_sql, params = queryset.values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT spec.key, spec.value, COUNT(*)
+            FROM {Product._meta.db_table} AS product
+            CROSS JOIN LATERAL jsonb_each_text(
+                CASE WHEN jsonb_typeof(product.specifications) = 'object'
+                THEN product.specifications ELSE '{{}}'::jsonb END
+            ) AS spec
+            JOIN {SpecificationOption._meta.db_table} AS option
+              ON option.key = spec.key AND option.value = spec.value
+            WHERE product.id IN ({products_sql})
+            GROUP BY spec.key, spec.value
+            ORDER BY spec.key, spec.value
+            """,
+            params
+        )
+        rows = cursor.fetchall()
+    
+    facets = {}
+    for key, value, count in rows:
+        facets.setdefault(key, []).append({'value': value, 'count': count})
+    return [{'key': key, 'values': values} for key, values in facets.items()]
+
+
+def _ranges(queryset, totals, bins):
+    """Границы числовых фильтров и гистограммы одним агрегирующим запросом"""
+    edges = {}
+    histogram_aggregates = {}
+    for field in RANGE_FIELDS:
+        low, high = totals[f'{field}__min'], totals[f'{field}__max']
+        if low is None:
+            continue
+        field_edges = _bucket_edges(float(low), float(high), bins)
+        edges[field] = field_edges
+        last = len(field_edges) - 2
+        for i in range(len(field_edges) - 1):
+            condition = Q(**{f'{field}__gte': field_edges[i]})
+            if i < last:
+                condition &= Q(**{f'{field}__lt': field_edges[i + 1]})
+            histogram_aggregates[f'{field}__{i}'] = Count('id', filter=condition)
+    
+    histograms = queryset.aggregate(**histogram_aggregates) if histogram_aggregates else {}
+    
+    ranges = {}
+    for field in RANGE_FIELDS:
+        low, high = totals[f'{field}__min'], totals[f'{field}__max']
+        field_edges = edges.get(field, [])
+        ranges[field] = {
+            'min': low,
+            'max': high,
+            'histogram': [
+                {
+                    'from': field_edges[i],
+                    'to': field_edges[i + 1],
+                    'count': histograms[f'{field}__{i}'],
+                }
+                for i in range(len(field_edges) - 1)
+            ],
+        }
+    return ranges
+
+
+def _bucket_edges(low, high, bins):
+    if low == high:
+        return [low, high]
+    width = (high - low) / bins
+    return [round(low + width * i, 2) for i in range(bins)] + [high]
@@ -0,0 +1,164 @@
+# backend/products/feeds.py
+"""Выгрузка каталога для Яндекс Маркета и агрегаторов цен (YML и CSV)"""
+import csv
+import os
+from urllib.parse import urljoin
+from xml.sax.saxutils import escape, quoteattr
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .cache import schedule_rebuild
+from .models import Category, Product
+from .utils import write_atomic
+
+
+FEED_CHUNK_SIZE = 500
+FEED_REBUILD_LOCK = 'feeds:rebuild:scheduled'
+
+# Формат -> (имя файла, Content-Type)
+FEED_FORMATS = {
+    'yml': ('products.yml', 'application/xml; charset=utf-8'),
+    'csv': ('products.csv', 'text/csv; charset=utf-8'),
+}
+
+# Характеристики, выгружаемые как param (YML) и колонки (CSV)
+FEED_PARAMS = [
+    ('blade_length', 'Длина клинка', 'мм'),
+    ('total_length', 'Общая длина', 'мм'),
+    ('weight', 'Вес', 'г'),
+    ('blade_thickness', 'Толщина клинка', 'мм'),
+    ('blade_material', 'Материал клинка', ''),
+    ('handle_material', 'Материал рукояти', ''),
+    ('hardness', 'Твердость', 'HRC'),
+]
+
+CSV_COLUMNS = [
+    'id', 'name', 'url', 'price', 'currency', 'category', 'available', 'picture',
+] + [field for field, _, _ in FEED_PARAMS]
+
+
+def feed_queryset():
+    """Товары для выгрузки: без отсутствующих, с категорией и главным фото одним запросом"""
+    return Product.objects.exclude(stock_status='out_of_stock').select_related(
+        'category', 'main_image'
+    ).defer('search_vector', 'specifications').order_by('id')
+
+
+def iter_products():
+    return feed_queryset().iterator(chunk_size=FEED_CHUNK_SIZE)
+
+
+def product_url(product):
+    return urljoin(settings.SITE_URL, f'/product/{product.slug}')
+
+
+def picture_url(product):
+    if product.main_image_id is None:
+        return ''
+    return urljoin(settings.SITE_URL, default_storage.url(product.main_image.image.name))
+
+
+def feed_path(fmt):
+    return os.path.join(settings.FEEDS_DIR, FEED_FORMATS[fmt][0])
+
+
+def iter_yml():
+    """YML-каталог по частям: шапка, категории и по предложению на товар"""
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield f'<yml_catalog date={quoteattr(timezone.localtime().isoformat(timespec="minutes"))}>\n'
+    yield '<shop>\n'
+    yield f'<name>{escape(settings.SHOP_NAME)}</name>\n'
+    yield f'<company>{escape(settings.SHOP_COMPANY)}</company>\n'
+    yield f'<url>{escape(settings.SITE_URL)}</url>\n'
+    yield '<currencies><currency id="RUR" rate="1"/></currencies>\n'
+    
+    yield '<categories>\n'
+    for category_id, parent_id, name in Category.objects.values_list('id', 'parent_id', 'name'):
+        parent = f' parentId="{parent_id}"' if parent_id else ''
+        yield f'<category id="{category_id}"{parent}>{escape(name)}</category>\n'
+    yield '</categories>\n'
+    
+    yield '<offers>\n'
+    for product in iter_products():
+        # available="false" в YML означает «под заказ»
+        available = 'true' if product.stock_status == 'in_stock' else 'false'
+        parts = [
+            f'<offer id="{product.id}" available="{available}">',
+            f'<url>{escape(product_url(product))}</url>',
+            f'<price>{product.price}</price>',
+            '<currencyId>RUR</currencyId>',
+            f'<categoryId>{product.category_id}</categoryId>',
+        ]
+        picture = picture_url(product)
+        if picture:
+            parts.append(f'<picture>{escape(picture)}</picture>')
+        parts.append(f'<name>{escape(product.name)}</name>')
+        if product.description:
+            parts.append(f'<description>{escape(product.description)}</description>')
+        for field, label, unit in FEED_PARAMS:
+            value = getattr(product, field)
+            if value not in (None, ''):
+                unit_attr = f' unit={quoteattr(unit)}' if unit else ''
+                parts.append(f'<param name={quoteattr(label)}{unit_attr}>{escape(str(value))}</param>')
+        parts.append('</offer>\n')
+        yield ''.join(parts)
+    yield '</offers>\n'
+    yield '</shop>\n'
+    yield '</yml_catalog>\n'
+
+
+class _Echo:
+    """Файлоподобный объект для csv.writer: возвращает строку вместо записи"""
+    
+    def write(self, value):
+        return value
+
+
+def iter_csv():
+    """CSV-прайс по строке на товар"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for product in iter_products():
+        yield writer.writerow([
+            product.id,
+            product.name,
+            product_url(product),
+            product.price,
+            'RUB',
+            product.category.name,
+            'true' if product.stock_status == 'in_stock' else 'false',
+            picture_url(product),
+        ] + ['' if getattr(product, field) is None else getattr(product, field) for field, _, _ in FEED_PARAMS])
+
+
+FEED_WRITERS = {
+    'yml': iter_yml,
+    'csv': iter_csv,
+}
+
+
+def stream_feed(fmt):
+    return FEED_WRITERS[fmt]()
+
+
+def build_feed(fmt):
+    """Собрать готовый файл выгрузки (подменяется атомарно)"""
+    path = feed_path(fmt)
+    write_atomic(path, stream_feed(fmt))
+    return path
+
+
+def rebuild_feeds():
+    """Пересобрать все выгрузки (задача из очереди)"""
+    cache.delete(FEED_REBUILD_LOCK)
+    return [build_feed(fmt) for fmt in FEED_FORMATS]
+
+
+def schedule_feeds_rebuild(countdown=60):
+    """Выгрузки пересобираются с задержкой: правки в админке обычно идут сериями"""
+    from .tasks import rebuild_product_feeds
+    
+    schedule_rebuild(rebuild_product_feeds, FEED_REBUILD_LOCK, countdown=countdown)
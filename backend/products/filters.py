@@ -1,5 +1,11 @@
 import django_filters
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+from rest_framework import filters
+
 from .models import Product
+from .specs import spec_params, spec_q
 
 
 class ProductFilter(django_filters.FilterSet):
@@ -40,21 +46,50 @@ class ProductFilter(django_filters.FilterSet):
             'handle_material'
         ]
     
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        # Дополнительные характеристики: ?spec.<ключ>=<значение>, ключи через И, значения через ИЛИ
+        for key, values in spec_params(self.data).items():
+            if values:
+                queryset = queryset.filter(spec_q(key, values))
+        return queryset
+    
     def filter_by_category(self, queryset, name, value):
         """Фильтр по категории с учетом подкатегорий"""
         from .models import Category
         
-        try:
-            category = Category.objects.get(slug=value)
-            # Получаем ID категории и всех её подкатегорий
-            category_ids = [category.id]
-            
-            def get_children_ids(cat):
-                for child in cat.children.all():
-                    category_ids.append(child.id)
-                    get_children_ids(child)
-            
-            get_children_ids(category)
-            return queryset.filter(category_id__in=category_ids)
-        except Category.DoesNotExist:
-            return queryset.none()
\ No newline at end of file
+        path = Category.objects.filter(slug=value).values_list('path', flat=True).first()
+        if path is None:
+            return queryset.none()
+        # Всё поддерево выбирается по префиксу материализованного пути
+        return queryset.filter(category__path__startswith=path)
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """Полнотекстовый поиск по Product.search_vector с ранжированием"""
+    search_config = 'russian'
+    
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms:
+            return queryset
+        
+        query = SearchQuery(
+            ' '.join(search_terms),
+            config=self.search_config,
+            search_type='websearch'
+        )
+        # ts_rank возвращает real; в double precision ранг без потерь проходит через
+        # курсор пагинации и сравнивается на равенство
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+        ).order_by('-search_rank', '-created_at')
+
+
+class ProductOrderingFilter(filters.OrderingFilter):
+    """Сортировка по умолчанию не перебивает ранжирование результатов поиска"""
+    
+    def get_default_ordering(self, view):
+        if view.request.query_params.get(ProductSearchFilter.search_param):
+            return None
+        return super().get_default_ordering(view)
@@ -0,0 +1,64 @@
+# backend/products/home.py
+"""Данные главной страницы, предрасчитанные в кэше"""
+from django.core.cache import cache
+
+from .cache import get_catalog_version, schedule_rebuild
+from .models import Category, Product
+from .serializers import PopularCategorySerializer, ProductListSerializer
+
+
+HOME_CACHE_KEY = 'home:{version}'
+HOME_CACHE_TIMEOUT = 60 * 60 * 24
+HOME_REBUILD_LOCK = 'home:rebuild:scheduled'
+
+HERO_LIMIT = 5
+NEW_ARRIVALS_LIMIT = 6
+POPULAR_CATEGORIES_LIMIT = 6
+
+
+def build_home_payload():
+    """
+    Слайдер, новинки и категории одним словарем.
+    
+    Собирается без запроса, поэтому URL изображений относительные —
+    представление дополняет их хостом при ответе.
+    """
+    products = Product.objects.select_related('category', 'main_image')
+    children_map = Category.get_children_map()
+    context = {'category_children': children_map}
+    
+    hero = products.filter(is_featured=True)[:HERO_LIMIT]
+    new_arrivals = products.filter(is_new=True).order_by('-created_at')[:NEW_ARRIVALS_LIMIT]
+    # Популярные — корневые категории с наибольшим числом товаров (счетчики из category_counts)
+    categories = Category.objects.filter(parent__isnull=True, subtree_products_count__gt=0).order_by(
+        '-subtree_products_count', 'order', 'name'
+    )[:POPULAR_CATEGORIES_LIMIT]
+    return {
+        'hero': ProductListSerializer(hero, many=True, context=context).data,
+        'new_arrivals': ProductListSerializer(new_arrivals, many=True, context=context).data,
+        'categories': PopularCategorySerializer(categories, many=True).data,
+    }
+
+
+def get_home_payload():
+    """Данные главной для текущей версии каталога; строятся при промахе кэша"""
+    cache_key = HOME_CACHE_KEY.format(version=get_catalog_version())
+    payload = cache.get(cache_key)
+    if payload is None:
+        payload = build_home_payload()
+        cache.set(cache_key, payload, HOME_CACHE_TIMEOUT)
+    return payload
+
+
+def rebuild_home_payload():
+    """Пересобрать данные главной под текущую версию каталога"""
+    cache.delete(HOME_REBUILD_LOCK)
+    version = get_catalog_version()
+    cache.set(HOME_CACHE_KEY.format(version=version), build_home_payload(), HOME_CACHE_TIMEOUT)
+
+
+def schedule_home_rebuild(countdown=5):
+    """Поставить пересборку главной в очередь (не чаще одной на серию изменений)"""
+    from .tasks import rebuild_home_cache
+    
+    schedule_rebuild(rebuild_home_cache, HOME_REBUILD_LOCK, countdown=countdown)
@@ -0,0 +1,515 @@
+# backend/products/importer.py
+"""
+Массовый импорт каталога из CSV/XLSX.
+
+Строки файла сравниваются с текущими товарами (по артикулу, затем по slug),
+изменения записываются пакетно через bulk_create/bulk_update. Неизменные
+товары не трогаются, фото скачиваются пулом потоков уже после записи.
+Из админки импорт запускается задачей Celery; ее состояние и отчет
+хранятся в кэше (см. start_import_job).
+"""
+import csv
+import io
+import os
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, models, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .category_counts import reconcile_category_counts
+from .detail import invalidate_product_details
+from .models import PRODUCT_SEARCH_VECTOR, SEARCH_FIELDS, Category, PriceHistory, Product, ProductImage
+from .specs import SPEC_PARAM_PREFIX, add_specification_options
+
+
+# Колонки файла, которые переносятся в одноименные поля товара
+IMPORT_FIELDS = [
+    'name',
+    'description',
+    'price',
+    'blade_length',
+    'total_length',
+    'weight',
+    'blade_thickness',
+    'blade_material',
+    'handle_material',
+    'hardness',
+    'stock_status',
+    'is_featured',
+    'is_new',
+]
+REQUIRED_COLUMNS = {'name', 'price', 'category'}
+# Поля без значения по умолчанию: у нового товара ячейки не могут быть пустыми
+REQUIRED_FOR_NEW = ['name', 'price']
+
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y', 'да', '+'}
+FALSE_VALUES = {'0', 'false', 'f', 'no', 'n', 'нет', '-'}
+IMAGE_SEPARATOR_RE = re.compile(r'[\s;|]+')
+XLSX_EXTENSIONS = ('.xlsx', '.xlsm')
+IMPORT_EXTENSIONS = ('.csv', *XLSX_EXTENSIONS)
+
+BATCH_SIZE = 500
+IMAGE_WORKERS = 8
+IMAGE_TIMEOUT = 15
+
+IMPORT_JOB_KEY = 'catalog-import:{job_id}'
+IMPORT_JOB_TIMEOUT = 60 * 60 * 24
+JOB_PENDING = 'pending'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+
+class CatalogImportError(Exception):
+    """Файл импорта не удалось прочитать целиком"""
+
+
+class ImportReport:
+    """Итоги импорта: что создано, изменено и какие строки отклонены"""
+    
+    def __init__(self):
+        self.created = []
+        self.updated = {}
+        self.unchanged = 0
+        self.errors = []
+        self.images = 0
+        self.image_errors = []
+    
+    def add_error(self, line, message):
+        self.errors.append((line, message))
+    
+    def summary(self):
+        return (
+            f'создано: {len(self.created)}, изменено: {len(self.updated)}, '
+            f'без изменений: {self.unchanged}, ошибок: {len(self.errors)}, '
+            f'фото: {self.images} (не скачано: {len(self.image_errors)})'
+        )
+    
+    def as_dict(self):
+        """Отчет для хранения в кэше (состояние задачи импорта)"""
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'errors': self.errors,
+            'images': self.images,
+            'image_errors': self.image_errors,
+            'summary': self.summary(),
+        }
+
+
+def read_rows(file, filename):
+    """Строки файла как словари «колонка → текст» с номерами строк"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.csv':
+        rows = _read_csv(file)
+    elif extension in XLSX_EXTENSIONS:
+        rows = _read_xlsx(file)
+    else:
+        raise CatalogImportError(f'Неподдерживаемый формат файла: {extension or filename}')
+    
+    try:
+        header = next(rows)
+    except StopIteration:
+        raise CatalogImportError('Файл пуст')
+    columns = [str(column or '').strip().lower() for column in header]
+    missing = REQUIRED_COLUMNS.difference(columns)
+    if missing:
+        raise CatalogImportError(f'Нет обязательных колонок: {", ".join(sorted(missing))}')
+    
+    for line, values in enumerate(rows, start=2):
+        row = {
+            column: _cell_text(value)
+            for column, value in zip(columns, values)
+            if column
+        }
+        if any(row.values()):
+            yield line, row
+
+
+def _read_csv(file):
+    content = file.read()
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    # Разделитель (запятая или точка с запятой) определяется по первой строке
+    dialect = csv.Sniffer().sniff(content.split('\n', 1)[0], delimiters=',;\t')
+    yield from csv.reader(io.StringIO(content), dialect)
+
+
+def _read_xlsx(file):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise CatalogImportError('Для импорта XLSX нужен пакет openpyxl')
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _clean_value(field, text):
+    """Значение ячейки, приведенное и проверенное полем модели"""
+    if isinstance(field, models.BooleanField):
+        lowered = text.lower()
+        if lowered in TRUE_VALUES:
+            return True
+        if lowered in FALSE_VALUES:
+            return False
+        raise ValidationError(f'ожидается да/нет, получено «{text}»')
+    if isinstance(field, (models.DecimalField, models.IntegerField)):
+        text = text.replace('\xa0', '').replace(' ', '').replace(',', '.')
+    return field.clean(text, None)
+
+
+class CatalogImporter:
+    """Сравнение строк файла с каталогом и пакетная запись изменений"""
+    
+    def __init__(self, dry_run=False, download_images=True, image_workers=IMAGE_WORKERS):
+        self.dry_run = dry_run
+        self.download_images = download_images
+        self.image_workers = image_workers
+        self.report = ImportReport()
+    
+    def run(self, file, filename):
+        rows = list(read_rows(file, filename))
+        categories = self.resolve_categories(rows)
+        existing_by_sku, existing_by_slug = self.load_existing(rows)
+        
+        to_create, to_update, images = [], {}, {}
+        seen, seen_slugs = set(), set()
+        for line, row in rows:
+            try:
+                product, changed, is_new = self.diff_row(
+                    row, categories, existing_by_sku, existing_by_slug
+                )
+            except ValidationError as error:
+                self.report.add_error(line, '; '.join(error.messages))
+                continue
+            
+            key = product.sku or product.slug
+            if key in seen:
+                self.report.add_error(line, f'товар {key} уже встречался в файле')
+                continue
+            # Разные артикулы с одинаковым названием дают один slug, а он уникален
+            if is_new and product.slug in seen_slugs:
+                self.report.add_error(
+                    line,
+                    f'slug {product.slug} уже занят другой строкой файла, заполните колонку slug'
+                )
+                continue
+            seen.add(key)
+            seen_slugs.add(product.slug)
+            
+            if is_new:
+                product._import_line = line
+                to_create.append(product)
+                self.report.created.append(key)
+            elif changed:
+                to_update[product.pk] = (product, changed)
+                self.report.updated[key] = sorted(changed)
+            else:
+                self.report.unchanged += 1
+            
+            urls = [url for url in IMAGE_SEPARATOR_RE.split(row.get('images', '')) if url]
+            if urls:
+                images[key] = (product, urls)
+        
+        if not self.dry_run:
+            self.apply(to_create, to_update)
+            if self.download_images:
+                self.import_images([
+                    (product, urls) for product, urls in images.values()
+                    if product.pk is not None and product.main_image_id is None
+                ])
+        return self.report
+    
+    def resolve_categories(self, rows):
+        """Категории всех строк одним запросом (по slug или названию)"""
+        values = {row['category'] for _, row in rows if row.get('category')}
+        categories = {}
+        for category in Category.objects.filter(Q(slug__in=values) | Q(name__in=values)):
+            categories.setdefault(category.name, category)
+            categories[category.slug] = category
+        return categories
+    
+    def load_existing(self, rows):
+        """Товары, совпадающие с файлом по артикулу или slug, одним запросом"""
+        skus = {row['sku'] for _, row in rows if row.get('sku')}
+        slugs = {row.get('slug') or slugify(row.get('name', '')) for _, row in rows}
+        slugs.discard('')
+        
+        existing_by_sku, existing_by_slug = {}, {}
+        products = Product.objects.filter(Q(sku__in=skus) | Q(slug__in=slugs)).defer('search_vector')
+        for product in products:
+            if product.sku:
+                existing_by_sku[product.sku] = product
+            existing_by_slug[product.slug] = product
+        return existing_by_sku, existing_by_slug
+    
+    def diff_row(self, row, categories, existing_by_sku, existing_by_slug):
+        """Товар для строки, изменившиеся поля и признак нового товара"""
+        sku = row.get('sku') or None
+        slug = row.get('slug') or slugify(row.get('name', ''))
+        
+        product = existing_by_sku.get(sku) if sku else None
+        if product is None:
+            product = existing_by_slug.get(slug)
+            if product is not None and sku and product.sku and product.sku != sku:
+                raise ValidationError(f'slug {slug} занят товаром с артикулом {product.sku}')
+        is_new = product is None
+        if is_new:
+            if not slug:
+                raise ValidationError('не удалось построить slug из названия, заполните колонку slug')
+            product = Product(slug=slug, sku=sku)
+        
+        values = {}
+        errors = []
+        for name in IMPORT_FIELDS:
+            text = row.get(name, '')
+            if not text:
+                continue
+            try:
+                values[name] = _clean_value(Product._meta.get_field(name), text)
+            except ValidationError as error:
+                errors.append(f'{name}: {"; ".join(error.messages)}')
+        
+        category = categories.get(row.get('category', ''))
+        if category is None:
+            errors.append(f'category: категория «{row.get("category", "")}» не найдена')
+        else:
+            values['category_id'] = category.pk
+        
+        specifications = {
+            column[len(SPEC_PARAM_PREFIX):]: text
+            for column, text in row.items()
+            if column.startswith(SPEC_PARAM_PREFIX) and text
+        }
+        if specifications:
+            values['specifications'] = {**(product.specifications or {}), **specifications}
+        if sku and product.sku != sku:
+            values['sku'] = sku
+        
+        if is_new:
+            errors += [
+                f'{name}: обязательное поле для нового товара'
+                for name in REQUIRED_FOR_NEW
+                if not row.get(name)
+            ]
+        if errors:
+            raise ValidationError(errors)
+        
+        changed = set()
+        for name, value in values.items():
+            if is_new or getattr(product, name) != value:
+                if name == 'price' and not is_new:
+                    # Для истории цен
+                    product._previous_price = product.price
+                setattr(product, name, value)
+                changed.add(name)
+        return product, changed, is_new
+    
+    @transaction.atomic
+    def apply(self, to_create, to_update):
+        """Записать новые и измененные товары пакетами"""
+        from .signals import catalog_committed
+        
+        to_create = self.create_products(to_create)
+        
+        if to_update:
+            now = timezone.now()
+            fields = {'updated_at'}
+            for product, changed in to_update.values():
+                product.updated_at = now
+                fields.update(changed)
+            Product.objects.bulk_update(
+                [product for product, _ in to_update.values()],
+                sorted(fields),
+                batch_size=BATCH_SIZE
+            )
+            PriceHistory.objects.bulk_create([
+                PriceHistory(
+                    product=product,
+                    old_price=product._previous_price,
+                    new_price=product.price,
+                    reason='Импорт каталога',
+                    changed_at=now
+                )
+                for product, changed in to_update.values()
+                if 'price' in changed
+            ], batch_size=BATCH_SIZE)
+        
+        # bulk-операции обходят save(): поисковый вектор и справочник характеристик вручную
+        search_ids = [product.pk for product in to_create] + [
+            product.pk
+            for product, changed in to_update.values()
+            if SEARCH_FIELDS.intersection(changed)
+        ]
+        for start in range(0, len(search_ids), BATCH_SIZE):
+            Product.objects.filter(pk__in=search_ids[start:start + BATCH_SIZE]).update(
+                search_vector=PRODUCT_SEARCH_VECTOR
+            )
+        add_specification_options(*(
+            product.specifications
+            for product in to_create + [product for product, _ in to_update.values()]
+        ))
+        
+        invalidate_product_details(product.slug for product, _ in to_update.values())
+        if to_create or any({'category_id', 'stock_status'} & changed for _, changed in to_update.values()):
+            # bulk-операции обходят сигналы счетчиков категорий
+            reconcile_category_counts()
+        if to_create or to_update:
+            transaction.on_commit(catalog_committed)
+    
+    def create_products(self, products):
+        """
+        Создать товары пакетами; возвращает созданные.
+        
+        Если пакет нарушает ограничение БД, которое не поймала проверка строк,
+        его товары создаются по одному, а отказ записывается в ошибки строки.
+        """
+        created = []
+        for start in range(0, len(products), BATCH_SIZE):
+            batch = products[start:start + BATCH_SIZE]
+            try:
+                with transaction.atomic():
+                    Product.objects.bulk_create(batch)
+                created += batch
+                continue
+            except IntegrityError:
+                pass
+            for product in batch:
+                product.pk = None
+                try:
+                    with transaction.atomic():
+                        Product.objects.bulk_create([product])
+                except IntegrityError as error:
+                    key = product.sku or product.slug
+                    self.report.add_error(product._import_line, f'товар {key} не создан: {error}')
+                    self.report.created.remove(key)
+                else:
+                    created.append(product)
+        return created
+    
+    def import_images(self, items):
+        """Скачать фото пулом потоков и привязать их к товарам без галереи"""
+        from .signals import catalog_committed
+        
+        jobs = [
+            (product, order, url)
+            for product, urls in items
+            for order, url in enumerate(urls)
+        ]
+        if not jobs:
+            return
+        
+        with ThreadPoolExecutor(max_workers=self.image_workers) as executor:
+            results = list(executor.map(lambda job: self.fetch_image(*job), jobs))
+        
+        images = []
+        for (product, order, url), (name, error) in zip(jobs, results):
+            if error:
+                self.report.image_errors.append((product.sku or product.slug, url, error))
+            else:
+                images.append(ProductImage(product=product, image=name, order=order, is_main=order == 0))
+        
+        with transaction.atomic():
+            ProductImage.objects.bulk_create(images, batch_size=BATCH_SIZE)
+            main_images = {}
+            for image in images:
+                main_images.setdefault(image.product_id, image)
+            products = []
+            for product_id, image in main_images.items():
+                image.product.main_image = image
+                products.append(image.product)
+            Product.objects.bulk_update(products, ['main_image'], batch_size=BATCH_SIZE)
+            invalidate_product_details(product.slug for product in products)
+            transaction.on_commit(catalog_committed)
+        self.report.images = len(images)
+    
+    def fetch_image(self, product, order, url):
+        """Скачать одно фото в хранилище; (имя файла, None) или (None, ошибка)"""
+        try:
+            response = requests.get(url, timeout=IMAGE_TIMEOUT)
+            response.raise_for_status()
+        except requests.RequestException as error:
+            return None, str(error)
+        
+        extension = os.path.splitext(urlparse(url).path)[1].lower() or '.jpg'
+        name = default_storage.save(
+            f'products/{product.slug}_{order}{extension}',
+            ContentFile(response.content)
+        )
+        return name, None
+
+
+def get_import_job(job_id):
+    """Состояние задачи импорта или None, если она неизвестна (или устарела)"""
+    return cache.get(IMPORT_JOB_KEY.format(job_id=job_id))
+
+
+def _set_import_job(job_id, **state):
+    cache.set(IMPORT_JOB_KEY.format(job_id=job_id), state, IMPORT_JOB_TIMEOUT)
+
+
+def start_import_job(upload, dry_run=False, download_images=True):
+    """
+    Сохранить загруженный файл и поставить импорт в очередь.
+    
+    Возвращает id задачи для страницы состояния.
+    """
+    from .tasks import import_catalog_file
+    
+    job_id = uuid.uuid4().hex
+    extension = os.path.splitext(upload.name)[1].lower()
+    os.makedirs(settings.IMPORTS_DIR, exist_ok=True)
+    path = os.path.join(settings.IMPORTS_DIR, f'{job_id}{extension}')
+    with open(path, 'wb') as file:
+        for chunk in upload.chunks():
+            file.write(chunk)
+    
+    _set_import_job(job_id, state=JOB_PENDING, filename=upload.name, dry_run=dry_run)
+    import_catalog_file.delay(job_id, path, upload.name, dry_run, download_images)
+    return job_id
+
+
+def run_import_job(job_id, path, filename, dry_run=False, download_images=True):
+    """Выполнить импорт из сохраненного файла и записать отчет в состояние задачи"""
+    job = {'filename': filename, 'dry_run': dry_run}
+    _set_import_job(job_id, state=JOB_RUNNING, **job)
+    try:
+        importer = CatalogImporter(dry_run=dry_run, download_images=download_images)
+        with open(path, 'rb') as file:
+            report = importer.run(file, filename)
+    except CatalogImportError as error:
+        _set_import_job(job_id, state=JOB_FAILED, error=str(error), **job)
+    except Exception:
+        error = 'Внутренняя ошибка импорта, подробности в логе'
+        _set_import_job(job_id, state=JOB_FAILED, error=error, **job)
+        raise
+    else:
+        _set_import_job(job_id, state=JOB_DONE, report=report.as_dict(), **job)
+    finally:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from products.snapshot import build_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Собрать колоночный снимок каталога для списка товаров'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Собрать, даже если CATALOG_SNAPSHOT_ENABLED выключен'
+        )
+    
+    def handle(self, *args, **options):
+        if not settings.CATALOG_SNAPSHOT_ENABLED and not options['force']:
+            self.stdout.write('Снимок каталога выключен (CATALOG_SNAPSHOT_ENABLED), пропускаем')
+            return
+        name = build_snapshot()
+        self.stdout.write(self.style.SUCCESS(f'Снимок каталога {name} собран'))
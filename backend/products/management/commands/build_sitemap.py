@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from products.sitemap import build_sitemaps
+
+
+class Command(BaseCommand):
+    help = 'Пересобрать изменившиеся части sitemap (или все с --full)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Переписать все части, не сравнивая с прошлой сборкой'
+        )
+    
+    def handle(self, *args, **options):
+        written = build_sitemaps(full=options['full'])
+        if written:
+            self.stdout.write(self.style.SUCCESS(f'Sitemap обновлен: {", ".join(written)}'))
+        else:
+            self.stdout.write('Sitemap не изменился')
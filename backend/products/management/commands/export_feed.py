@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from products.feeds import FEED_FORMATS, build_feed, stream_feed
+
+
+class Command(BaseCommand):
+    help = 'Выгрузить каталог для маркетплейсов (YML/CSV) в готовые файлы или в stdout'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format',
+            choices=sorted(FEED_FORMATS),
+            help='Формат выгрузки (по умолчанию все)'
+        )
+        parser.add_argument(
+            '--stream',
+            action='store_true',
+            help='Вывести выгрузку потоком в stdout вместо записи файла'
+        )
+    
+    def handle(self, *args, **options):
+        formats = [options['format']] if options['format'] else sorted(FEED_FORMATS)
+        
+        if options['stream']:
+            for fmt in formats:
+                for chunk in stream_feed(fmt):
+                    self.stdout.write(chunk, ending='')
+            return
+        
+        for fmt in formats:
+            path = build_feed(fmt)
+            self.stdout.write(self.style.SUCCESS(f'Выгрузка {fmt}: {path}'))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from products.importer import IMAGE_WORKERS, CatalogImporter, CatalogImportError
+
+
+class Command(BaseCommand):
+    help = 'Импорт каталога из CSV/XLSX: создание новых и обновление измененных товаров'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл .csv или .xlsx')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать изменения, ничего не записывать'
+        )
+        parser.add_argument(
+            '--no-images',
+            action='store_true',
+            help='Не скачивать фото из колонки images'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=IMAGE_WORKERS,
+            help='Потоков для скачивания фото'
+        )
+    
+    def handle(self, *args, **options):
+        importer = CatalogImporter(
+            dry_run=options['dry_run'],
+            download_images=not options['no_images'],
+            image_workers=options['workers']
+        )
+        try:
+            with open(options['path'], 'rb') as file:
+                report = importer.run(file, options['path'])
+        except (OSError, CatalogImportError) as error:
+            raise CommandError(error)
+        
+        for key in report.created:
+            self.stdout.write(f'+ {key}')
+        for key, fields in report.updated.items():
+            self.stdout.write(f'~ {key}: {", ".join(fields)}')
+        for line, message in report.errors:
+            self.stderr.write(f'строка {line}: {message}')
+        for key, url, error in report.image_errors:
+            self.stderr.write(f'фото {key} ({url}): {error}')
+        
+        prefix = 'Проверка без записи — ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(f'{prefix}{report.summary()}'))
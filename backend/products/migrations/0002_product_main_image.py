@@ -0,0 +1,36 @@
+# Generated by Django 5.0.1 on 2026-10-17 06:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_main_image(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    ProductImage = apps.get_model('products', 'ProductImage')
+    
+    main_images = {}
+    images = ProductImage.objects.order_by('product_id', '-is_main', 'order', 'pk')
+    for image in images.only('pk', 'product_id').iterator():
+        main_images.setdefault(image.product_id, image.pk)
+    
+    products = [
+        Product(pk=product_id, main_image_id=image_id)
+        for product_id, image_id in main_images.items()
+    ]
+    Product.objects.bulk_update(products, ['main_image'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='main_image',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='products.productimage', verbose_name='Главное изображение'),
+        ),
+        migrations.RunPython(fill_main_image, migrations.RunPython.noop),
+    ]
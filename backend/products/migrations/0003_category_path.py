@@ -0,0 +1,41 @@
+# Generated by Django 5.0.1 on 2026-10-17 06:02
+
+from django.db import migrations, models
+
+
+def fill_category_path(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    
+    categories = {category.pk: category for category in Category.objects.all()}
+    
+    def build_path(category):
+        if not category.path:
+            parent = categories.get(category.parent_id)
+            category.path = (build_path(parent) if parent else '') + f'{category.pk}/'
+            category.depth = category.path.count('/') - 1
+        return category.path
+    
+    for category in categories.values():
+        build_path(category)
+    Category.objects.bulk_update(categories.values(), ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_product_main_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Уровень вложенности'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255, verbose_name='Путь в дереве'),
+        ),
+        migrations.RunPython(fill_category_path, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.1 on 2026-10-17 06:02
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def fill_search_vector(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Product.objects.update(search_vector=(
+        django.contrib.postgres.search.SearchVector('name', weight='A', config='russian')
+        + django.contrib.postgres.search.SearchVector(
+            'blade_material', 'handle_material', weight='B', config='russian'
+        )
+        + django.contrib.postgres.search.SearchVector('description', weight='C', config='russian')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_category_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_vector_gin'),
+        ),
+        migrations.RunPython(fill_search_vector, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.0.1 on 2026-10-17 06:10
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+def fill_specification_options(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    SpecificationOption = apps.get_model('products', 'SpecificationOption')
+    
+    pairs = set()
+    for specifications in Product.objects.values_list('specifications', flat=True).iterator():
+        if not isinstance(specifications, dict):
+            continue
+        for key, value in specifications.items():
+            if isinstance(value, (dict, list)) or value is None:
+                continue
+            value = 'true' if value is True else 'false' if value is False else str(value)
+            if value and len(key) <= 100 and len(value) <= 255:
+                pairs.add((key, value))
+    SpecificationOption.objects.bulk_create(
+        [SpecificationOption(key=key, value=value) for key, value in pairs],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_category_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpecificationOption',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, verbose_name='Характеристика')),
+                ('value', models.CharField(max_length=255, verbose_name='Значение')),
+            ],
+            options={
+                'verbose_name': 'Значение характеристики',
+                'verbose_name_plural': 'Значения характеристик',
+                'ordering': ['key', 'value'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['specifications'], name='product_specifications_gin', opclasses=['jsonb_path_ops']),
+        ),
+        migrations.AlterUniqueTogether(
+            name='specificationoption',
+            unique_together={('key', 'value')},
+        ),
+        migrations.RunPython(fill_specification_options, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.1 on 2026-10-17 06:18
+
+from django.db import migrations, models
+
+
+def fill_recent_views(apps, schema_editor):
+    # Истории просмотров нет — стартуем с накопленного счетчика
+    Product = apps.get_model('products', 'Product')
+    Product.objects.update(recent_views=models.F('views_count'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_product_sku'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='popularity_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Популярность'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='recent_views',
+            field=models.FloatField(default=0, editable=False, verbose_name='Недавние просмотры'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-popularity_score', '-created_at'], name='product_popularity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', '-popularity_score', '-created_at'], name='product_category_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['stock_status', '-popularity_score', '-created_at'], name='product_stock_popular_idx'),
+        ),
+        migrations.RunPython(fill_recent_views, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.1 on 2026-10-17 06:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_product_popularity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BoughtTogether',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lift', models.FloatField(verbose_name='Lift')),
+                ('orders_count', models.PositiveIntegerField(verbose_name='Совместных заказов')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Позиция')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bought_together', to='products.product', verbose_name='Товар')),
+                ('together', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bought_with', to='products.product', verbose_name='Покупают вместе')),
+            ],
+            options={
+                'verbose_name': 'Покупают вместе',
+                'verbose_name_plural': 'Покупают вместе',
+                'ordering': ['product', 'rank'],
+                'unique_together': {('product', 'rank')},
+            },
+        ),
+    ]
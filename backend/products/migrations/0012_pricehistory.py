@@ -0,0 +1,35 @@
+# Generated by Django 5.0.1 on 2026-10-17 06:27
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_boughttogether'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Старая цена')),
+                ('new_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Новая цена')),
+                ('reason', models.CharField(blank=True, max_length=255, verbose_name='Причина')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата изменения')),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Кто изменил')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='products.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Изменение цены',
+                'verbose_name_plural': 'История цен',
+                'ordering': ['-changed_at'],
+                'indexes': [models.Index(fields=['product', '-changed_at'], name='products_pr_product_f0e7be_idx'), models.Index(fields=['-changed_at'], name='products_pr_changed_a0647a_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.0.1 on 2026-10-17 06:29
+
+from django.db import migrations, models
+
+
+def fill_category_counts(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    Product = apps.get_model('products', 'Product')
+    
+    direct = {
+        row['category_id']: (row['total'], row['in_stock'])
+        for row in Product.objects.order_by().values('category_id').annotate(
+            total=models.Count('id'),
+            in_stock=models.Count('id', filter=models.Q(stock_status='in_stock'))
+        )
+    }
+    categories = list(Category.objects.all())
+    by_id = {category.id: category for category in categories}
+    for category in categories:
+        category.products_count, category.in_stock_count = direct.get(category.id, (0, 0))
+    for category in categories:
+        for pk in category.path.split('/'):
+            if pk and int(pk) in by_id:
+                by_id[int(pk)].subtree_products_count += category.products_count
+                by_id[int(pk)].subtree_in_stock_count += category.in_stock_count
+    Category.objects.bulk_update(categories, [
+        'products_count',
+        'in_stock_count',
+        'subtree_products_count',
+        'subtree_in_stock_count',
+    ])
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('products', '0012_pricehistory'),
+    ]
+    
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='in_stock_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В наличии'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='products_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Товаров'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='subtree_in_stock_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В наличии с подкатегориями'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='subtree_products_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Товаров с подкатегориями'),
+        ),
+        migrations.RunPython(fill_category_counts, migrations.RunPython.noop),
+    ]
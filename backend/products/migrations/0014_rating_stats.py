@@ -0,0 +1,80 @@
+# Generated by Django 5.0.1 on 2026-10-17 06:32
+
+from django.db import migrations, models
+from django.db.models.functions import Cast, Round
+
+
+def fill_rating_stats(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Review = apps.get_model('reviews', 'Review')
+    
+    stats = Review.objects.filter(is_approved=True).order_by().values('product_id').annotate(
+        rating_sum=models.Sum('rating'),
+        rating_count=models.Count('id'),
+        **{
+            f'rating_count_{stars}': models.Count('id', filter=models.Q(rating=stars))
+            for stars in range(1, 6)
+        }
+    )
+    for row in stats:
+        Product.objects.filter(pk=row.pop('product_id')).update(**row)
+    
+    # average_rating выводится из суммы и количества
+    Product.objects.update(average_rating=models.Case(
+        models.When(
+            rating_count__gt=0,
+            then=Round(
+                Cast('rating_sum', models.DecimalField(max_digits=12, decimal_places=2)) / models.F('rating_count'),
+                2
+            )
+        ),
+        default=models.Value(0),
+        output_field=models.DecimalField()
+    ))
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('products', '0013_category_counts'),
+        ('reviews', '0001_initial'),
+    ]
+    
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество оценок'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count_1',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок «1»'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count_2',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок «2»'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count_3',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок «3»'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count_4',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок «4»'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count_5',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок «5»'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Сумма оценок'),
+        ),
+        migrations.RunPython(fill_rating_stats, migrations.RunPython.noop),
+    ]
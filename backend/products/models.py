@@ -1,9 +1,49 @@
 # backend/products/models.py
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
+from django.utils import timezone
 from django.utils.text import slugify
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 
+# Поля полнотекстового поиска и их веса (конфигурация russian)
+SEARCH_FIELDS = {'name', 'description', 'blade_material', 'handle_material'}
+PRODUCT_SEARCH_VECTOR = (
+    SearchVector('name', weight='A', config='russian')
+    + SearchVector('blade_material', 'handle_material', weight='B', config='russian')
+    + SearchVector('description', weight='C', config='russian')
+)
+
+# Счетчики товара, которые ведут UPDATE ... F(): просмотры (flush_product_views)
+# и статистика оценок (reviews.ratings)
+COUNTER_FIELDS = {
+    'views_count',
+    'recent_views',
+    'average_rating',
+    'rating_sum',
+    'rating_count',
+    'rating_count_1',
+    'rating_count_2',
+    'rating_count_3',
+    'rating_count_4',
+    'rating_count_5',
+}
+
+# Производные поля, которые пересчитываются отдельно от товара: популярность
+# (popularity.recompute_popularity) и главное фото (refresh_main_image, импорт)
+DERIVED_FIELDS = {
+    'popularity_score',
+    'main_image',
+}
+
+
 class Category(models.Model):
     """Категория товаров с поддержкой древовидной структуры"""
     name = models.CharField('Название', max_length=200)
@@ -19,6 +59,32 @@ class Category(models.Model):
     icon_name = models.CharField('Имя иконки', max_length=100, blank=True)
     order = models.IntegerField('Порядок сортировки', default=0)
     
+    # Материализованный путь: id предков и самой категории, например "1/4/9/"
+    path = models.CharField(
+        'Путь в дереве',
+        max_length=255,
+        blank=True,
+        editable=False,
+        db_index=True
+    )
+    depth = models.PositiveSmallIntegerField('Уровень вложенности', default=0, editable=False)
+    
+    # Счетчики товаров (поддерживает products.category_counts)
+    products_count = models.PositiveIntegerField('Товаров', default=0, editable=False)
+    in_stock_count = models.PositiveIntegerField('В наличии', default=0, editable=False)
+    subtree_products_count = models.PositiveIntegerField(
+        'Товаров с подкатегориями',
+        default=0,
+        editable=False
+    )
+    subtree_in_stock_count = models.PositiveIntegerField(
+        'В наличии с подкатегориями',
+        default=0,
+        editable=False
+    )
+    
+    updated_at = models.DateTimeField('Дата обновления', auto_now=True)
+    
     class Meta:
         verbose_name = 'Категория'
         verbose_name_plural = 'Категории'
@@ -27,10 +93,59 @@ class Category(models.Model):
     def __str__(self):
         return self.name
     
+    def clean(self):
+        if self.pk and self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first()
+            if parent_path and str(self.pk) in parent_path.split('/'):
+                raise ValidationError({
+                    'parent': 'Категорию нельзя вложить в её собственную подкатегорию'
+                })
+    
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
         super().save(*args, **kwargs)
+        self.update_path()
+    
+    def update_path(self):
+        """Пересчитать путь категории и всего её поддерева (при создании и переносе)"""
+        parent_path = ''
+        if self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).get()
+        new_path = f'{parent_path}{self.pk}/'
+        new_depth = new_path.count('/') - 1
+        
+        old_path, old_depth = Category.objects.filter(pk=self.pk).values_list('path', 'depth').get()
+        if new_path != old_path:
+            Category.objects.filter(pk=self.pk).update(path=new_path, depth=new_depth)
+            if old_path:
+                # Всё поддерево переносится одним UPDATE по префиксу пути
+                Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                    path=Concat(Value(new_path), Substr('path', len(old_path) + 1)),
+                    depth=F('depth') + (new_depth - old_depth)
+                )
+        self.path = new_path
+        self.depth = new_depth
+    
+    @property
+    def ancestor_ids(self):
+        """id предков от корня, без самой категории"""
+        return [int(pk) for pk in self.path.split('/') if pk][:-1]
+    
+    def get_descendants(self, include_self=True):
+        """Поддерево категории одним запросом по префиксу пути"""
+        descendants = Category.objects.filter(path__startswith=self.path)
+        if not include_self:
+            descendants = descendants.exclude(pk=self.pk)
+        return descendants
+    
+    @staticmethod
+    def get_children_map():
+        """Все категории одним запросом, сгруппированные по parent_id"""
+        children_map = defaultdict(list)
+        for category in Category.objects.all():
+            children_map[category.parent_id].append(category)
+        return children_map
 
 
 class Product(models.Model):
@@ -45,6 +160,7 @@ class Product(models.Model):
     # Основная информация
     name = models.CharField('Название', max_length=200)
     slug = models.SlugField('URL', max_length=200, unique=True, blank=True)
+    sku = models.CharField('Артикул', max_length=64, unique=True, null=True, blank=True)
     description = models.TextField('Описание', blank=True)
     category = models.ForeignKey(
         Category,
@@ -97,6 +213,17 @@ class Product(models.Model):
         blank=True
     )
     
+    # Главное изображение (денормализовано из ProductImage)
+    main_image = models.ForeignKey(
+        'ProductImage',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        editable=False,
+        verbose_name='Главное изображение'
+    )
+    
     # Статусы и флаги
     stock_status = models.CharField(
         'Статус наличия',
@@ -116,6 +243,21 @@ class Product(models.Model):
         default=0,
         validators=[MinValueValidator(0), MaxValueValidator(5)]
     )
+    # Статистика одобренных отзывов (ведет reviews.ratings, average_rating выводится из нее)
+    rating_sum = models.PositiveIntegerField('Сумма оценок', default=0, editable=False)
+    rating_count = models.PositiveIntegerField('Количество оценок', default=0, editable=False)
+    rating_count_1 = models.PositiveIntegerField('Оценок «1»', default=0, editable=False)
+    rating_count_2 = models.PositiveIntegerField('Оценок «2»', default=0, editable=False)
+    rating_count_3 = models.PositiveIntegerField('Оценок «3»', default=0, editable=False)
+    rating_count_4 = models.PositiveIntegerField('Оценок «4»', default=0, editable=False)
+    rating_count_5 = models.PositiveIntegerField('Оценок «5»', default=0, editable=False)
+    
+    # Популярность (пересчитывает задача update_popularity_scores)
+    recent_views = models.FloatField('Недавние просмотры', default=0, editable=False)
+    popularity_score = models.FloatField('Популярность', default=0, editable=False)
+    
+    # Полнотекстовый поиск (заполняется в save)
+    search_vector = SearchVectorField('Поисковый вектор', null=True, editable=False)
     
     # Временные метки
     created_at = models.DateTimeField('Дата создания', auto_now_add=True)
@@ -131,6 +273,35 @@ class Product(models.Model):
             models.Index(fields=['-created_at']),
             models.Index(fields=['is_featured']),
             models.Index(fields=['is_new']),
+            # Сортировка «по популярности» (по умолчанию в каталоге)
+            models.Index(fields=['-popularity_score', '-created_at'], name='product_popularity_idx'),
+            models.Index(
+                fields=['category', '-popularity_score', '-created_at'],
+                name='product_category_popular_idx'
+            ),
+            models.Index(
+                fields=['stock_status', '-popularity_score', '-created_at'],
+                name='product_stock_popular_idx'
+            ),
+            GinIndex(fields=['search_vector'], name='product_search_vector_gin'),
+            # Триграммы для подсказок поиска с опечатками
+            GinIndex(fields=['name'], name='product_name_trgm', opclasses=['gin_trgm_ops']),
+            GinIndex(
+                fields=['blade_material'],
+                name='product_blade_material_trgm',
+                opclasses=['gin_trgm_ops']
+            ),
+            GinIndex(
+                fields=['handle_material'],
+                name='product_handle_material_trgm',
+                opclasses=['gin_trgm_ops']
+            ),
+            # Фильтры по specifications (оператор @>)
+            GinIndex(
+                fields=['specifications'],
+                name='product_specifications_gin',
+                opclasses=['jsonb_path_ops']
+            ),
         ]
     
     def __str__(self):
@@ -139,23 +310,42 @@ class Product(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+        # Счетчики и производные поля меняются UPDATE в обход объекта: полное сохранение
+        # существующего товара (админка, импорт) не записывает их, иначе затерло бы
+        # параллельные приращения и пересчеты
+        if not (self._state.adding or args or kwargs.get('force_insert')) and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in COUNTER_FIELDS | DERIVED_FIELDS
+            ]
         super().save(*args, **kwargs)
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or SEARCH_FIELDS.intersection(update_fields):
+            self.update_search_vector()
     
-    def increment_views(self):
-        """Увеличить счетчик просмотров"""
-        self.views_count += 1
-        self.save(update_fields=['views_count'])
+    def update_search_vector(self):
+        """Пересчитать поисковый вектор товара"""
+        Product.objects.filter(pk=self.pk).update(search_vector=PRODUCT_SEARCH_VECTOR)
     
     def update_rating(self):
-        """Обновить средний рейтинг на основе отзывов"""
-        from reviews.models import Review
-        reviews = Review.objects.filter(product=self, is_approved=True)
-        if reviews.exists():
-            avg = reviews.aggregate(models.Avg('rating'))['rating__avg']
-            self.average_rating = round(avg, 2)
-        else:
-            self.average_rating = 0
-        self.save(update_fields=['average_rating'])
+        """Пересчитать статистику оценок по отзывам (обычно ее сдвигают сигналы отзывов)"""
+        from reviews.ratings import RATING_FIELDS, reconcile_product_ratings
+        reconcile_product_ratings([self.pk])
+        self.refresh_from_db(fields=RATING_FIELDS)
+    
+    @property
+    def rating_distribution(self):
+        """Число одобренных оценок по звездам: {1: ..., 5: ...}"""
+        return {stars: getattr(self, f'rating_count_{stars}') for stars in range(1, 6)}
+    
+    def refresh_main_image(self):
+        """Пересчитать ссылку на главное изображение"""
+        main_image = self.images.order_by('-is_main', 'order', 'pk').first()
+        # updated_at меняется вместе с галереей (ETag/Last-Modified страницы товара)
+        self.updated_at = timezone.now()
+        Product.objects.filter(pk=self.pk).update(main_image=main_image, updated_at=self.updated_at)
+        self.main_image = main_image
 
 
 class ProductImage(models.Model):
@@ -185,4 +375,109 @@ class ProductImage(models.Model):
                 product=self.product,
                 is_main=True
             ).exclude(pk=self.pk).update(is_main=False)
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+        self.product.refresh_main_image()
+
+
+class SimilarProduct(models.Model):
+    """Похожий товар из предрасчитанного индекса (см. products.similarity)"""
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='similar_products',
+        verbose_name='Товар'
+    )
+    similar = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий товар'
+    )
+    score = models.FloatField('Сходство')
+    rank = models.PositiveSmallIntegerField('Позиция')
+    
+    class Meta:
+        verbose_name = 'Похожий товар'
+        verbose_name_plural = 'Похожие товары'
+        ordering = ['product', 'rank']
+        unique_together = ['product', 'rank']
+    
+    def __str__(self):
+        return f"{self.product_id} → {self.similar_id} ({self.score:.3f})"
+
+
+class PriceHistory(models.Model):
+    """Изменение цены товара (см. products.pricing)"""
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='price_history',
+        verbose_name='Товар'
+    )
+    old_price = models.DecimalField('Старая цена', max_digits=10, decimal_places=2)
+    new_price = models.DecimalField('Новая цена', max_digits=10, decimal_places=2)
+    reason = models.CharField('Причина', max_length=255, blank=True)
+    changed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Кто изменил'
+    )
+    changed_at = models.DateTimeField('Дата изменения', default=timezone.now)
+    
+    class Meta:
+        verbose_name = 'Изменение цены'
+        verbose_name_plural = 'История цен'
+        ordering = ['-changed_at']
+        indexes = [
+            models.Index(fields=['product', '-changed_at']),
+            models.Index(fields=['-changed_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id}: {self.old_price} → {self.new_price}"
+
+
+class BoughtTogether(models.Model):
+    """Товар, который часто покупают вместе с данным (см. orders.bought_together)"""
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='bought_together',
+        verbose_name='Товар'
+    )
+    together = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='bought_with',
+        verbose_name='Покупают вместе'
+    )
+    lift = models.FloatField('Lift')
+    orders_count = models.PositiveIntegerField('Совместных заказов')
+    rank = models.PositiveSmallIntegerField('Позиция')
+    
+    class Meta:
+        verbose_name = 'Покупают вместе'
+        verbose_name_plural = 'Покупают вместе'
+        ordering = ['product', 'rank']
+        unique_together = ['product', 'rank']
+    
+    def __str__(self):
+        return f"{self.product_id} + {self.together_id} (lift {self.lift:.2f})"
+
+
+class SpecificationOption(models.Model):
+    """Пара ключ/значение из Product.specifications (справочник для фильтров)"""
+    key = models.CharField('Характеристика', max_length=100)
+    value = models.CharField('Значение', max_length=255)
+    
+    class Meta:
+        verbose_name = 'Значение характеристики'
+        verbose_name_plural = 'Значения характеристик'
+        ordering = ['key', 'value']
+        unique_together = ['key', 'value']
+    
+    def __str__(self):
+        return f"{self.key}: {self.value}"
@@ -0,0 +1,161 @@
+# backend/products/pagination.py
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class ProductKeysetPagination(BasePagination):
+    """
+    Курсорная (keyset) пагинация для бесконечной ленты каталога.
+    
+    Вместо OFFSET следующая страница выбирается по значениям полей сортировки
+    последнего товара (с id в качестве уникального разрешителя), поэтому
+    глубокие страницы стоят столько же, сколько первая, и COUNT(*) не нужен.
+    Приблизительное количество (?count=approx) берется из оценки планировщика.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    count_query_param = 'count'
+    tiebreaker = 'id'
+    invalid_cursor_message = 'Некорректный курсор'
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+        queryset = queryset.order_by(*self.ordering)
+        
+        self.approximate_count = None
+        if request.query_params.get(self.count_query_param) == 'approx':
+            self.approximate_count = self.estimate_count(queryset)
+        
+        position = self.decode_cursor(request, queryset)
+        if position is not None:
+            queryset = queryset.filter(self.position_filter(position))
+        
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        results = results[:self.page_size]
+        self.next_position = self.get_position(results[-1]) if self.has_next else None
+        return results
+    
+    def get_paginated_response(self, data):
+        response = {'next': self.get_next_link(), 'results': data}
+        if self.approximate_count is not None:
+            response['approximate_count'] = self.approximate_count
+        return Response(response)
+    
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+        if page_size <= 0:
+            return api_settings.PAGE_SIZE
+        return min(page_size, self.max_page_size)
+    
+    def get_ordering(self, request, queryset, view):
+        """
+        Сортировка из OrderingFilter представления плюс уникальный разрешитель.
+        
+        Без явной сортировки берется сортировка самой выборки (поиск упорядочивает
+        по search_rank), и только затем сортировка представления по умолчанию.
+        """
+        ordering = None
+        for backend in getattr(view, 'filter_backends', []):
+            if hasattr(backend, 'get_ordering'):
+                ordering = backend().get_ordering(request, queryset, view)
+                break
+        ordering = [
+            field for field in (
+                ordering or queryset.query.order_by or getattr(view, 'ordering', None) or []
+            )
+            if isinstance(field, str) and field.lstrip('-') != self.tiebreaker
+        ]
+        direction = '-' if ordering and ordering[-1].startswith('-') else ''
+        return ordering + [direction + self.tiebreaker]
+    
+    def position_filter(self, position):
+        """(a, b, id) после позиции курсора с учетом направления каждого поля"""
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            step = Q(**{f'{name}__{lookup}': position[i]})
+            for previous, value in zip(self.ordering[:i], position):
+                step &= Q(**{previous.lstrip('-'): value})
+            condition |= step
+        return condition
+    
+    def get_position(self, instance):
+        if isinstance(instance, dict):
+            return [instance[field.lstrip('-')] for field in self.ordering]
+        return [getattr(instance, field.lstrip('-')) for field in self.ordering]
+    
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+    
+    def encode_cursor(self, position):
+        payload = {
+            'o': self.ordering,
+            'p': [self._encode_value(value) for value in position],
+        }
+        encoded = base64.urlsafe_b64encode(json.dumps(payload).encode())
+        return encoded.decode().rstrip('=')
+    
+    def decode_cursor(self, request, queryset):
+        """Позиция из курсора; пустой ?cursor= означает первую страницу"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padding = '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(encoded + padding))
+            if payload['o'] != self.ordering or len(payload['p']) != len(self.ordering):
+                raise ValueError
+            return [
+                self.get_field(queryset, field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, payload['p'])
+            ]
+        except (TypeError, ValueError, KeyError, binascii.Error, ValidationError, FieldDoesNotExist):
+            raise NotFound(self.invalid_cursor_message)
+    
+    @staticmethod
+    def get_field(queryset, name):
+        """Поле модели или аннотации выборки (например, search_rank)"""
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        return queryset.model._meta.get_field(name)
+    
+    def estimate_count(self, queryset):
+        """Оценка количества строк по плану запроса вместо COUNT(*)"""
+        sql, params = queryset.query.sql_with_params()
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]['Plan']['Plan Rows']
+    
+    @staticmethod
+    def _encode_value(value):
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
@@ -0,0 +1,100 @@
+# backend/products/popularity.py
+"""Оценка популярности товара для сортировки каталога «по популярности»"""
+import math
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import Product
+
+
+# Просмотры затухают экспоненциально: вес просмотра уменьшается вдвое за VIEWS_HALF_LIFE секунд
+VIEWS_HALF_LIFE = 7 * 24 * 60 * 60
+SALES_WINDOW_DAYS = 90
+# Статусы заказов, которые считаются продажей
+SOLD_STATUSES = ['paid', 'processing', 'shipped', 'delivered', 'made_to_order']
+
+# Веса слагаемых оценки
+VIEWS_WEIGHT = 1.0
+SALES_WEIGHT = 3.0
+RATING_WEIGHT = 1.0
+REVIEWS_WEIGHT = 0.5
+
+# Байесовское сглаживание рейтинга: товар с парой отзывов тянется к среднему
+RATING_PRIOR = 4.0
+RATING_PRIOR_WEIGHT = 3
+
+LAST_RUN_KEY = 'products:popularity:last_run'
+BATCH_SIZE = 500
+
+
+def decay_recent_views():
+    """Состарить недавние просмотры на время, прошедшее с прошлого пересчета"""
+    now = time.time()
+    last_run = cache.get(LAST_RUN_KEY)
+    cache.set(LAST_RUN_KEY, now, timeout=None)
+    if last_run is None or now <= last_run:
+        return
+    factor = 0.5 ** ((now - last_run) / VIEWS_HALF_LIFE)
+    Product.objects.update(recent_views=F('recent_views') * factor)
+
+
+def units_sold():
+    """Продано штук за окно SALES_WINDOW_DAYS по товарам"""
+    from orders.models import OrderItem
+    
+    since = timezone.now() - timedelta(days=SALES_WINDOW_DAYS)
+    return dict(
+        OrderItem.objects.filter(
+            order__status__in=SOLD_STATUSES,
+            order__created_at__gte=since
+        ).values_list('product_id').annotate(units=Sum('quantity'))
+    )
+
+
+def approved_review_counts():
+    from reviews.models import Review
+    
+    return dict(
+        Review.objects.filter(is_approved=True).values_list('product_id').annotate(count=Count('id'))
+    )
+
+
+def popularity_score(recent_views, units, rating, reviews):
+    smoothed_rating = (
+        (rating * reviews + RATING_PRIOR * RATING_PRIOR_WEIGHT) / (reviews + RATING_PRIOR_WEIGHT)
+    )
+    return round(
+        VIEWS_WEIGHT * math.log1p(recent_views)
+        + SALES_WEIGHT * math.log1p(units)
+        + RATING_WEIGHT * (smoothed_rating - RATING_PRIOR)
+        + REVIEWS_WEIGHT * math.log1p(reviews),
+        4
+    )
+
+
+def recompute_popularity():
+    """Пересчитать Product.popularity_score; записываются только изменившиеся оценки"""
+    decay_recent_views()
+    sales = units_sold()
+    reviews = approved_review_counts()
+    
+    changed = []
+    rows = Product.objects.values_list('id', 'recent_views', 'average_rating', 'popularity_score')
+    for product_id, recent_views, rating, current in rows.iterator(chunk_size=BATCH_SIZE):
+        score = popularity_score(
+            recent_views,
+            sales.get(product_id, 0),
+            float(rating),
+            reviews.get(product_id, 0)
+        )
+        if score != current:
+            changed.append(Product(id=product_id, popularity_score=score))
+    
+    with transaction.atomic():
+        Product.objects.bulk_update(changed, ['popularity_score'], batch_size=BATCH_SIZE)
+    return len(changed)
@@ -0,0 +1,103 @@
+# backend/products/pricing.py
+"""
+Массовое изменение цен одним UPDATE с записью истории цен.
+
+Новая цена считается в БД выражением от F('price'); та же формула в Python
+дает значения для PriceHistory, поэтому цены не перечитываются после записи.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest, Round
+from django.utils import timezone
+
+from .models import PriceHistory, Product
+
+
+REPRICE_PERCENT = 'percent'
+REPRICE_FIXED = 'fixed'
+REPRICE_MODES = [
+    (REPRICE_PERCENT, 'На процент'),
+    (REPRICE_FIXED, 'На сумму'),
+]
+
+PRICE_PLACES = Product._meta.get_field('price').decimal_places
+PRICE_QUANTUM = Decimal(1).scaleb(-PRICE_PLACES)
+HISTORY_BATCH_SIZE = 1000
+
+
+def reprice_error(mode, value):
+    """Причина, по которой изменение нельзя применить, или None (общее правило API и админки)"""
+    if value == 0:
+        return 'Изменение цены не может быть нулевым'
+    if mode == REPRICE_PERCENT and value <= -100:
+        return 'Снижение больше чем на 100% обнулит цены'
+    return None
+
+
+def price_expression(mode, value):
+    """Новая цена как выражение БД (не ниже нуля, с округлением до копеек)"""
+    if mode == REPRICE_PERCENT:
+        price = F('price') * Value(1 + value / 100)
+    else:
+        price = F('price') + Value(value)
+    return Greatest(Round(price, PRICE_PLACES), Value(Decimal(0)))
+
+
+def new_price(mode, value, price):
+    """Та же формула в Python; numeric round в Postgres округляет половину от нуля"""
+    if mode == REPRICE_PERCENT:
+        price = price * (1 + value / 100)
+    else:
+        price = price + value
+    return max(price.quantize(PRICE_QUANTUM, rounding=ROUND_HALF_UP), Decimal(0))
+
+
+@transaction.atomic
+def reprice(queryset, mode, value, user=None, reason=''):
+    """
+    Изменить цены товаров queryset на процент или на сумму.
+    
+    Строки блокируются на время операции, цены меняются одним UPDATE,
+    история пишется через bulk_create, кэши сбрасываются одним пакетом
+    после фиксации. Возвращает число товаров с изменившейся ценой.
+    """
+    # Ленивый импорт: detail зависит от serializers, а те — от этого модуля
+    from .detail import invalidate_product_details
+    from .signals import catalog_committed
+    
+    value = Decimal(value)
+    current = list(
+        Product.objects.filter(pk__in=queryset.values('pk')).select_for_update().values_list(
+            'id', 'slug', 'price'
+        )
+    )
+    if not current:
+        return 0
+    
+    now = timezone.now()
+    Product.objects.filter(pk__in=queryset.values('pk')).update(
+        price=price_expression(mode, value),
+        updated_at=now
+    )
+    
+    history = []
+    slugs = []
+    for product_id, slug, old_price in current:
+        price = new_price(mode, value, old_price)
+        if price != old_price:
+            history.append(PriceHistory(
+                product_id=product_id,
+                old_price=old_price,
+                new_price=price,
+                reason=reason,
+                changed_by=user,
+                changed_at=now
+            ))
+            slugs.append(slug)
+    PriceHistory.objects.bulk_create(history, batch_size=HISTORY_BATCH_SIZE)
+    
+    invalidate_product_details(slugs)
+    transaction.on_commit(catalog_committed)
+    return len(history)
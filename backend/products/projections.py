@@ -0,0 +1,154 @@
+# backend/products/projections.py
+"""
+Быстрая сериализация списка товаров из .values() без ModelSerializer.
+
+Формат ответа совпадает с ProductListSerializer. Вложенные категории берутся
+из карты в памяти процесса, пересобираемой при смене версии категорий.
+Параметр ?fields= ограничивает набор полей (id возвращается всегда).
+"""
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from rest_framework.exceptions import ValidationError
+
+from .cache import catalog_cache_key, get_categories_version
+from .models import Category, Product
+from .serializers import CategorySerializer, ProductListSerializer
+
+
+FIELDS_PARAM = 'fields'
+LIST_FIELDS = ProductListSerializer.Meta.fields
+
+# Колонки .values(), нужные каждому полю ответа
+FIELD_COLUMNS = {
+    'id': ['id'],
+    'name': ['name'],
+    'slug': ['slug'],
+    'category': ['category_id'],
+    'price': ['price'],
+    'stock_status': ['stock_status'],
+    'is_featured': ['is_featured'],
+    'is_new': ['is_new'],
+    'average_rating': ['average_rating'],
+    'main_image': ['main_image__image'],
+}
+
+# Поля сортировки выбираются всегда: по ним курсорная пагинация строит позицию
+ORDERING_COLUMNS = ['created_at', 'views_count', 'price', 'average_rating', 'popularity_score']
+SEARCH_RANK = 'search_rank'
+
+CARD_CACHE_TIMEOUT = 60 * 60
+
+DECIMAL_PLACES = {
+    name: Product._meta.get_field(name).decimal_places
+    for name in ('price', 'average_rating')
+}
+
+
+_categories = (None, {})
+
+
+def category_payloads():
+    """Сериализованные категории (с поддеревом) по id; одна сборка на версию категорий"""
+    global _categories
+    
+    version = get_categories_version()
+    if _categories[0] != version:
+        children_map = Category.get_children_map()
+        context = {'category_children': children_map}
+        payloads = {
+            category.id: CategorySerializer(category, context=context).data
+            for categories in children_map.values()
+            for category in categories
+        }
+        _categories = (version, payloads)
+    return _categories[1]
+
+
+class ProductListProjection:
+    """Поля списка товаров из строк .values() в обычные словари"""
+    
+    def __init__(self, request, fields=None, absolute_urls=True):
+        self.request = request
+        self.fields = fields or self.get_fields(request)
+        # Для кэша URL фото остаются относительными (см. utils.absolutize_urls)
+        self.media_origin = request.build_absolute_uri('/')[:-1] if absolute_urls else ''
+    
+    def get_fields(self, request):
+        requested = request.query_params.get(FIELDS_PARAM)
+        if not requested:
+            return list(LIST_FIELDS)
+        fields = [field.strip() for field in requested.split(',') if field.strip()]
+        unknown = sorted(set(fields).difference(LIST_FIELDS))
+        if unknown:
+            raise ValidationError({FIELDS_PARAM: f'Неизвестные поля: {", ".join(unknown)}'})
+        return ['id'] + [field for field in LIST_FIELDS if field in fields and field != 'id']
+    
+    def values(self, queryset, *extra):
+        """Строки .values() с колонками запрошенных полей (и дополнительными extra)"""
+        columns = {'id', *ORDERING_COLUMNS, *extra}
+        # Ранг поиска тоже входит в позицию курсора
+        if SEARCH_RANK in queryset.query.annotations:
+            columns.add(SEARCH_RANK)
+        for field in self.fields:
+            columns.update(FIELD_COLUMNS[field])
+        return queryset.values(*sorted(columns))
+    
+    def serialize(self, rows):
+        fields = self.fields
+        categories = category_payloads() if 'category' in fields else {}
+        media_origin = self.media_origin
+        price_format = f'.{DECIMAL_PLACES["price"]}f'
+        rating_format = f'.{DECIMAL_PLACES["average_rating"]}f'
+        
+        data = []
+        for row in rows:
+            item = {}
+            for field in fields:
+                if field == 'category':
+                    item['category'] = categories.get(row['category_id'])
+                elif field == 'price':
+                    item['price'] = format(row['price'], price_format)
+                elif field == 'average_rating':
+                    item['average_rating'] = format(row['average_rating'], rating_format)
+                elif field == 'main_image':
+                    image = row['main_image__image']
+                    if image:
+                        url = default_storage.url(image)
+                        item['main_image'] = media_origin + url if url.startswith('/') else url
+                    else:
+                        item['main_image'] = None
+                else:
+                    item[field] = row[field]
+            data.append(item)
+        return data
+    
+    def pick(self, item):
+        """Запрошенные ?fields= поля из полной карточки"""
+        return {field: item[field] for field in self.fields}
+
+
+def get_product_cards(request, lookup, values):
+    """
+    Полные карточки товаров по id или slug с чтением через кэш по каждому товару.
+    
+    Возвращает словарь «значение → карточка» с относительными URL фото;
+    отсутствующие товары в него не попадают.
+    """
+    keys = {value: catalog_cache_key('card', lookup, value) for value in values}
+    cached = cache.get_many(list(keys.values()))
+    cards = {value: cached[key] for value, key in keys.items() if key in cached}
+    
+    missing = [value for value in values if value not in cards]
+    if missing:
+        projection = ProductListProjection(request, fields=list(LIST_FIELDS), absolute_urls=False)
+        rows = projection.values(Product.objects.filter(**{f'{lookup}__in': missing}))
+        fetched = {
+            card[lookup]: card
+            for card in projection.serialize(rows)
+        }
+        cache.set_many(
+            {keys[value]: card for value, card in fetched.items()},
+            CARD_CACHE_TIMEOUT
+        )
+        cards.update(fetched)
+    return cards
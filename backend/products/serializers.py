@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Category, Product, ProductImage
+from .pricing import REPRICE_MODES, reprice_error
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -11,9 +12,35 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'slug', 'parent', 'icon_name', 'order', 'children']
     
     def get_children(self, obj):
-        if obj.children.exists():
-            return CategorySerializer(obj.children.all(), many=True).data
-        return []
+        # Дерево собирается из одной выборки всех категорий, общей для всего ответа
+        children_map = self.context.get('category_children')
+        if children_map is None:
+            children_map = self.context['category_children'] = Category.get_children_map()
+        return type(self)(
+            children_map.get(obj.id, []),
+            many=True,
+            context=self.context
+        ).data
+
+
+class PopularCategorySerializer(serializers.ModelSerializer):
+    """Категория без поддерева (популярные категории на главной)"""
+    
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'slug', 'icon_name', 'subtree_products_count']
+
+
+class CategoryTreeSerializer(CategorySerializer):
+    """Категория со счетчиками товаров (дерево категорий)"""
+    
+    class Meta(CategorySerializer.Meta):
+        fields = CategorySerializer.Meta.fields + [
+            'products_count',
+            'in_stock_count',
+            'subtree_products_count',
+            'subtree_in_stock_count',
+        ]
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
@@ -45,9 +72,8 @@ class ProductListSerializer(serializers.ModelSerializer):
         ]
     
     def get_main_image(self, obj):
-        main_image = obj.images.filter(is_main=True).first()
-        if not main_image:
-            main_image = obj.images.first()
+        # Главное фото денормализовано в Product.main_image (см. ProductImage.save)
+        main_image = obj.main_image
         if main_image:
             request = self.context.get('request')
             if request:
@@ -60,6 +86,7 @@ class ProductDetailSerializer(serializers.ModelSerializer):
     """Детальный сериализатор для товара"""
     category = CategorySerializer(read_only=True)
     images = ProductImageSerializer(many=True, read_only=True)
+    rating_distribution = serializers.DictField(child=serializers.IntegerField(), read_only=True)
     
     class Meta:
         model = Product
@@ -83,7 +110,22 @@ class ProductDetailSerializer(serializers.ModelSerializer):
             'is_new',
             'views_count',
             'average_rating',
+            'rating_count',
+            'rating_distribution',
             'images',
             'created_at',
             'updated_at'
-        ]
\ No newline at end of file
+        ]
+
+
+class RepriceSerializer(serializers.Serializer):
+    """Параметры массового изменения цен"""
+    mode = serializers.ChoiceField(choices=REPRICE_MODES)
+    value = serializers.DecimalField(max_digits=12, decimal_places=2)
+    reason = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+    
+    def validate(self, attrs):
+        error = reprice_error(attrs['mode'], attrs['value'])
+        if error:
+            raise serializers.ValidationError({'value': error})
+        return attrs
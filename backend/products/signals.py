@@ -0,0 +1,189 @@
+# backend/products/signals.py
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import bump_catalog_version, bump_categories_version
+from .category_counts import adjust_category_counts, move_category_counts, path_ids
+from .counters import get_anonymous_visitor, merge_recently_viewed
+from .detail import (
+    invalidate_category_products,
+    invalidate_product_details,
+    invalidate_product_details_by_id
+)
+from .feeds import schedule_feeds_rebuild
+from .home import schedule_home_rebuild
+from .models import Category, PriceHistory, Product, ProductImage
+from .sitemap import schedule_sitemap_rebuild
+from .snapshot import schedule_snapshot_rebuild
+from .specs import add_specification_options
+
+
+# Поля-счетчики, изменение которых не влияет на закэшированные выборки
+METRIC_FIELDS = {'views_count'}
+# Поля, прежние значения которых нужны обработчикам post_save
+TRACKED_FIELDS = {'slug', 'price', 'category', 'category_id', 'stock_status'}
+
+
+@receiver(post_delete, sender=ProductImage)
+def product_image_deleted(sender, instance, **kwargs):
+    """Выбрать новое главное фото, если удалено текущее"""
+    # Ссылка на удаленное фото уже обнулена (on_delete=SET_NULL)
+    product = Product.objects.filter(
+        pk=instance.product_id,
+        main_image__isnull=True
+    ).first()
+    if product:
+        product.refresh_main_image()
+    else:
+        # Галерея изменилась — обновить метку для ETag/Last-Modified
+        Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_delete, sender=Category)
+def catalog_changed(sender, instance, update_fields=None, **kwargs):
+    """Сбросить кэш каталога после фиксации транзакции"""
+    if update_fields and METRIC_FIELDS.issuperset(update_fields):
+        return
+    transaction.on_commit(catalog_committed)
+
+
+def catalog_committed():
+    bump_catalog_version()
+    schedule_home_rebuild()
+    schedule_snapshot_rebuild()
+    schedule_feeds_rebuild()
+    schedule_sitemap_rebuild()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def categories_changed(sender, instance, **kwargs):
+    transaction.on_commit(bump_categories_version)
+
+
+@receiver(post_save, sender=Product)
+def product_specifications_saved(sender, instance, update_fields=None, **kwargs):
+    """Новые значения характеристик сразу попадают в справочник фильтров"""
+    if update_fields is None or 'specifications' in update_fields:
+        add_specification_options(instance.specifications)
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_state(sender, instance, update_fields=None, **kwargs):
+    """
+    Прежние значения полей товара до сохранения.
+    
+    slug — кэш страницы сбрасывается и по старому адресу, price — для истории
+    цен, category и stock_status — для счетчиков товаров в категориях.
+    """
+    instance._previous_state = None
+    if instance.pk and (update_fields is None or TRACKED_FIELDS.intersection(update_fields)):
+        instance._previous_state = Product.objects.filter(pk=instance.pk).values(
+            'slug', 'price', 'category_id', 'stock_status'
+        ).first()
+
+
+def previous_value(instance, field):
+    state = getattr(instance, '_previous_state', None)
+    return state[field] if state else None
+
+
+@receiver(post_save, sender=Product)
+def product_price_changed(sender, instance, created, **kwargs):
+    """Изменение цены при сохранении одного товара попадает в историю цен"""
+    previous = previous_value(instance, 'price')
+    if created or previous is None or previous == instance.price:
+        return
+    PriceHistory.objects.create(
+        product=instance,
+        old_price=previous,
+        new_price=instance.price,
+        changed_by=getattr(instance, '_changed_by', None)
+    )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_detail_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields and METRIC_FIELDS.issuperset(update_fields):
+        return
+    invalidate_product_details([instance.slug, previous_value(instance, 'slug')])
+
+
+@receiver(post_save, sender=Product)
+def product_counts_changed(sender, instance, created, **kwargs):
+    """Счетчики категорий сдвигаются при создании товара и смене категории или наличия"""
+    current = (instance.category_id, instance.stock_status)
+    if created:
+        adjust_category_counts([(*current, 1)])
+        return
+    previous = (previous_value(instance, 'category_id'), previous_value(instance, 'stock_status'))
+    if previous[0] is not None and previous != current:
+        adjust_category_counts([(*previous, -1), (*current, 1)])
+
+
+@receiver(post_delete, sender=Product)
+def product_counts_deleted(sender, instance, **kwargs):
+    adjust_category_counts([(instance.category_id, instance.stock_status, -1)])
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def product_image_detail_changed(sender, instance, **kwargs):
+    invalidate_product_details_by_id([instance.product_id])
+
+
+@receiver(pre_save, sender=Category)
+def remember_category_path(sender, instance, **kwargs):
+    """Прежний путь: при переносе категории меняются страницы товаров старых предков"""
+    instance._previous_path = None
+    if instance.pk:
+        instance._previous_path = Category.objects.filter(pk=instance.pk).values_list(
+            'path', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_detail_changed(sender, instance, **kwargs):
+    # post_save приходит до пересчета пути (см. Category.save), поэтому новые предки — через родителя
+    parent_path = ''
+    if instance.parent_id:
+        parent_path = Category.objects.filter(pk=instance.parent_id).values_list(
+            'path', flat=True
+        ).first() or ''
+    invalidate_category_products(
+        instance.path,
+        getattr(instance, '_previous_path', None),
+        f'{parent_path}{instance.pk}/'
+    )
+
+
+@receiver(post_save, sender=Category)
+def category_counts_moved(sender, instance, created, **kwargs):
+    """При смене родителя счетчики поддерева переходят к новым предкам"""
+    previous_path = getattr(instance, '_previous_path', None)
+    if created or not previous_path:
+        return
+    parent_path = ''
+    if instance.parent_id:
+        parent_path = Category.objects.filter(pk=instance.parent_id).values_list(
+            'path', flat=True
+        ).first() or ''
+    move_category_counts(instance.pk, path_ids(previous_path)[:-1], path_ids(parent_path))
+
+
+@receiver(user_logged_in)
+def recently_viewed_merged(sender, request, user, **kwargs):
+    """Недавно просмотренные до входа переходят в историю пользователя"""
+    visitor = get_anonymous_visitor(request) if request is not None else None
+    if visitor:
+        merge_recently_viewed(visitor, user)
@@ -0,0 +1,141 @@
+# backend/products/similarity.py
+"""Индекс похожих товаров по характеристикам (пересобирается задачей Celery)"""
+import re
+
+import numpy as np
+from django.db import transaction
+
+from .models import Product, SimilarProduct
+
+
+# Числовые характеристики и их веса в векторе признаков
+NUMERIC_WEIGHTS = {
+    'price': 2.0,
+    'blade_length': 1.0,
+    'total_length': 1.0,
+    'weight': 1.0,
+    'blade_thickness': 0.5,
+    'hardness': 0.5,
+}
+
+# Категориальные признаки (one-hot) и их веса
+CATEGORICAL_WEIGHTS = {
+    'category_id': 3.0,
+    'root_category': 1.0,
+    'blade_material': 1.0,
+    'handle_material': 1.0,
+}
+
+HARDNESS_RE = re.compile(r'\d+(?:[.,]\d+)?')
+
+
+def parse_hardness(value):
+    """Среднее значение HRC из строки вида "58-60" или "60 HRC" """
+    numbers = [float(number.replace(',', '.')) for number in HARDNESS_RE.findall(value or '')]
+    numbers = [number for number in numbers if 30 <= number <= 80]
+    return sum(numbers) / len(numbers) if numbers else np.nan
+
+
+def load_catalog():
+    """Строки каталога, нужные для построения признаков"""
+    rows = list(Product.objects.order_by('pk').values(
+        'id',
+        'category_id',
+        'category__path',
+        'price',
+        'blade_length',
+        'total_length',
+        'weight',
+        'blade_thickness',
+        'hardness',
+        'blade_material',
+        'handle_material',
+    ))
+    for row in rows:
+        row['hardness'] = parse_hardness(row['hardness'])
+        row['root_category'] = row.pop('category__path').split('/', 1)[0]
+        row['blade_material'] = row['blade_material'].strip().lower()
+        row['handle_material'] = row['handle_material'].strip().lower()
+    return rows
+
+
+def build_features(rows):
+    """Матрица признаков (товары × признаки) с единичной нормой строк"""
+    blocks = []
+    
+    for field, weight in NUMERIC_WEIGHTS.items():
+        column = np.array(
+            [np.nan if row[field] is None else float(row[field]) for row in rows],
+            dtype=np.float64
+        )
+        if field == 'price':
+            # Цены распределены логнормально
+            column = np.log1p(column)
+        known = ~np.isnan(column)
+        if known.sum() < 2:
+            continue
+        std = column[known].std()
+        column = (column - column[known].mean()) / (std if std > 0 else 1.0)
+        # Пропуски считаем средним значением
+        column[~known] = 0.0
+        blocks.append(column[:, None] * weight)
+    
+    for field, weight in CATEGORICAL_WEIGHTS.items():
+        values = np.array([str(row[field]) for row in rows])
+        vocabulary, codes = np.unique(values, return_inverse=True)
+        one_hot = np.zeros((len(rows), len(vocabulary)), dtype=np.float64)
+        one_hot[np.arange(len(rows)), codes] = weight
+        # Пустое значение не делает товары похожими
+        empty = np.flatnonzero(vocabulary == '')
+        if empty.size:
+            one_hot[:, empty[0]] = 0.0
+        blocks.append(one_hot)
+    
+    features = np.hstack(blocks)
+    norms = np.linalg.norm(features, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return features / norms
+
+
+def top_k_neighbours(features, k, batch_size=1024):
+    """Индексы и косинусное сходство k ближайших соседей для каждой строки"""
+    count = features.shape[0]
+    k = min(k, count - 1)
+    indices = np.empty((count, k), dtype=np.int64)
+    scores = np.empty((count, k), dtype=np.float64)
+    
+    for start in range(0, count, batch_size):
+        stop = min(start + batch_size, count)
+        similarity = features[start:stop] @ features.T
+        # Товар не похож сам на себя
+        similarity[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+        
+        candidates = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(similarity, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind='stable')
+        indices[start:stop] = np.take_along_axis(candidates, order, axis=1)
+        scores[start:stop] = np.take_along_axis(candidate_scores, order, axis=1)
+    
+    return indices, scores
+
+
+def rebuild_similarity_index(k=12):
+    """Пересчитать индекс похожих товаров целиком; возвращает число связей"""
+    rows = load_catalog()
+    entries = []
+    if len(rows) > 1:
+        ids = np.array([row['id'] for row in rows])
+        indices, scores = top_k_neighbours(build_features(rows), k)
+        for i, product_id in enumerate(ids):
+            for rank, (j, score) in enumerate(zip(indices[i], scores[i])):
+                entries.append(SimilarProduct(
+                    product_id=int(product_id),
+                    similar_id=int(ids[j]),
+                    score=float(score),
+                    rank=rank
+                ))
+    
+    with transaction.atomic():
+        SimilarProduct.objects.all().delete()
+        SimilarProduct.objects.bulk_create(entries, batch_size=1000)
+    return len(entries)
@@ -0,0 +1,197 @@
+# backend/products/sitemap.py
+"""
+Sitemap каталога: индекс, страница категорий и товары частями по диапазонам id.
+
+Часть products-N содержит товары с id из [N * SITEMAP_CHUNK_SIZE, (N + 1) * SITEMAP_CHUNK_SIZE),
+поэтому изменение товара затрагивает ровно одну часть. Для каждой части хранится
+состояние (число товаров и максимальный updated_at); при пересборке одним
+агрегирующим запросом находятся изменившиеся части, и переписываются только они.
+Готовые файлы отдаются представлением SitemapView без обращений к БД.
+"""
+import json
+import os
+import re
+from datetime import datetime, timezone as dt_timezone
+from urllib.parse import urljoin
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Max
+
+from .cache import schedule_rebuild
+from .models import Category, Product
+from .utils import write_atomic
+
+
+SITEMAP_CHUNK_SIZE = 10000
+SITEMAP_REBUILD_LOCK = 'sitemap:rebuild:scheduled'
+SITEMAP_URL_PREFIX = '/sitemaps/'
+
+INDEX_NAME = 'sitemap'
+CATEGORIES_NAME = 'categories'
+STATE_FILE = 'state.json'
+SITEMAP_NAME_RE = re.compile(rf'{INDEX_NAME}|{CATEGORIES_NAME}|products-\d+')
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+XMLNS = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+
+# Приоритеты и частота обновления страниц (ТЗ, п. 19.2)
+HOME_PRIORITY = ('1.0', 'daily')
+CATALOG_PRIORITY = ('0.9', 'daily')
+PRODUCT_PRIORITY = ('0.8', 'weekly')
+
+
+def sitemap_path(name):
+    return os.path.join(settings.SITEMAPS_DIR, f'{name}.xml')
+
+
+def sitemap_url(name):
+    if name == INDEX_NAME:
+        return urljoin(settings.SITE_URL, f'/{INDEX_NAME}.xml')
+    return urljoin(settings.SITE_URL, f'{SITEMAP_URL_PREFIX}{name}.xml')
+
+
+def chunk_name(chunk):
+    return f'products-{chunk}'
+
+
+def _lastmod(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _url(path, lastmod=None, priority=None):
+    parts = [f'<url><loc>{escape(urljoin(settings.SITE_URL, path))}</loc>']
+    if lastmod is not None:
+        parts.append(f'<lastmod>{_lastmod(lastmod)}</lastmod>')
+    if priority is not None:
+        parts.append(f'<changefreq>{priority[1]}</changefreq><priority>{priority[0]}</priority>')
+    parts.append('</url>\n')
+    return ''.join(parts)
+
+
+def iter_categories_sitemap(last_modified):
+    """Главная, каталог и страницы каталога по категориям"""
+    yield XML_HEADER
+    yield f'<urlset {XMLNS}>\n'
+    yield _url('/', priority=HOME_PRIORITY)
+    yield _url('/catalog', last_modified, CATALOG_PRIORITY)
+    for slug, updated_at in Category.objects.order_by('path').values_list('slug', 'updated_at'):
+        yield _url(f'/catalog?category={slug}', updated_at, CATALOG_PRIORITY)
+    yield '</urlset>\n'
+
+
+def iter_products_sitemap(chunk):
+    """Товары одной части"""
+    start = chunk * SITEMAP_CHUNK_SIZE
+    products = Product.objects.filter(
+        id__gte=start, id__lt=start + SITEMAP_CHUNK_SIZE
+    ).order_by('id').values_list('slug', 'updated_at')
+    
+    yield XML_HEADER
+    yield f'<urlset {XMLNS}>\n'
+    for slug, updated_at in products.iterator(chunk_size=2000):
+        yield _url(f'/product/{slug}', updated_at, PRODUCT_PRIORITY)
+    yield '</urlset>\n'
+
+
+def iter_index(entries):
+    yield XML_HEADER
+    yield f'<sitemapindex {XMLNS}>\n'
+    for name, lastmod in entries:
+        lastmod = f'<lastmod>{_lastmod(lastmod)}</lastmod>' if lastmod else ''
+        yield f'<sitemap><loc>{escape(sitemap_url(name))}</loc>{lastmod}</sitemap>\n'
+    yield '</sitemapindex>\n'
+
+
+def load_state():
+    try:
+        with open(os.path.join(settings.SITEMAPS_DIR, STATE_FILE)) as state_file:
+            return json.load(state_file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_state(state):
+    write_atomic(os.path.join(settings.SITEMAPS_DIR, STATE_FILE), [json.dumps(state)])
+
+
+def catalog_state():
+    """Число записей и последнее изменение категорий и каждой части товаров"""
+    state = {}
+    categories = Category.objects.aggregate(count=Count('id'), last_modified=Max('updated_at'))
+    state[CATEGORIES_NAME] = categories
+    chunks = Product.objects.annotate(chunk=F('id') / SITEMAP_CHUNK_SIZE).values('chunk').annotate(
+        count=Count('id'),
+        last_modified=Max('updated_at')
+    ).order_by('chunk')
+    for row in chunks:
+        state[chunk_name(row['chunk'])] = {
+            'count': row['count'],
+            'last_modified': row['last_modified'],
+        }
+    
+    # Дата «каталога» — последнее изменение любого товара или категории
+    dates = [item['last_modified'] for item in state.values() if item['last_modified']]
+    state[CATEGORIES_NAME]['catalog_modified'] = max(dates) if dates else None
+    # Состояние хранится в JSON и сравнивается с прошлым с точностью до микросекунд
+    return {
+        name: {key: value.isoformat() if isinstance(value, datetime) else value for key, value in item.items()}
+        for name, item in state.items()
+    }
+
+
+def _parse(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def build_sitemaps(full=False):
+    """
+    Пересобрать изменившиеся части sitemap и индекс.
+    
+    Возвращает список переписанных файлов (пустой, если ничего не менялось).
+    """
+    previous = {} if full else load_state()
+    state = catalog_state()
+    
+    written = []
+    for name, item in state.items():
+        if previous.get(name) == item and os.path.exists(sitemap_path(name)):
+            continue
+        if name == CATEGORIES_NAME:
+            chunks = iter_categories_sitemap(_parse(item['catalog_modified']))
+        else:
+            chunks = iter_products_sitemap(int(name.rsplit('-', 1)[1]))
+        write_atomic(sitemap_path(name), chunks)
+        written.append(name)
+    
+    # Части, в которых не осталось товаров
+    removed = [name for name in previous if name not in state]
+    for name in removed:
+        try:
+            os.remove(sitemap_path(name))
+        except FileNotFoundError:
+            pass
+    
+    if written or removed or not os.path.exists(sitemap_path(INDEX_NAME)):
+        entries = [
+            (name, _parse(item.get('catalog_modified') or item['last_modified']))
+            for name, item in state.items()
+        ]
+        write_atomic(sitemap_path(INDEX_NAME), iter_index(entries))
+        written.append(INDEX_NAME)
+    save_state(state)
+    return written
+
+
+def rebuild_sitemaps():
+    """Пересобрать sitemap (задача из очереди)"""
+    cache.delete(SITEMAP_REBUILD_LOCK)
+    return build_sitemaps()
+
+
+def schedule_sitemap_rebuild(countdown=60):
+    """Sitemap пересобирается с задержкой, одной задачей на серию изменений"""
+    from .tasks import rebuild_sitemap
+    
+    schedule_rebuild(rebuild_sitemap, SITEMAP_REBUILD_LOCK, countdown=countdown)
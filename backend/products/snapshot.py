@@ -0,0 +1,316 @@
+# backend/products/snapshot.py
+"""
+Колоночный снимок каталога для списка товаров (включается CATALOG_SNAPSHOT_ENABLED).
+
+Поля фильтров и сортировок выгружаются в .npy по колонке на файл. Воркеры
+gunicorn открывают их через mmap только для чтения, поэтому страницы памяти
+общие для всех процессов. Фильтры и сортировка считаются векторно, из БД
+читаются только товары текущей страницы. Новый снимок пишется в отдельный
+каталог, после чего ссылка current атомарно переключается на него.
+"""
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import schedule_rebuild
+from .filters import ProductFilter
+from .models import Category, Product
+
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_REBUILD_LOCK = 'catalog:snapshot:rebuild:scheduled'
+CURRENT_LINK = 'current'
+KEEP_SNAPSHOTS = 2
+
+# Колонки снимка и их типы (NaN — пустое значение числовой характеристики)
+COLUMNS = {
+    'id': 'i8',
+    'category_id': 'i8',
+    'price': 'f8',
+    'blade_length': 'f8',
+    'total_length': 'f8',
+    'weight': 'f8',
+    'stock_status': 'i1',
+    'is_featured': '?',
+    'is_new': '?',
+    'blade_material': 'i4',
+    'handle_material': 'i4',
+    'views_count': 'i8',
+    'average_rating': 'f8',
+    'popularity_score': 'f8',
+    'created_at': 'i8',
+    'updated_at': 'i8',
+}
+
+# Текстовые колонки хранятся кодами из словаря значений
+VOCABULARY_COLUMNS = ['blade_material', 'handle_material']
+DATETIME_COLUMNS = ['created_at', 'updated_at']
+
+RANGE_FILTERS = {
+    'price_min': ('price', 'gte'),
+    'price_max': ('price', 'lte'),
+    'blade_length_min': ('blade_length', 'gte'),
+    'blade_length_max': ('blade_length', 'lte'),
+    'total_length_min': ('total_length', 'gte'),
+    'total_length_max': ('total_length', 'lte'),
+    'weight_min': ('weight', 'gte'),
+    'weight_max': ('weight', 'lte'),
+}
+
+# Параметры, которые снимок обрабатывает сам; с любыми другими список идет в БД
+PASSIVE_PARAMS = {'ordering', 'page', 'page_size', 'format', 'fields'}
+SUPPORTED_PARAMS = set(ProductFilter.base_filters) | PASSIVE_PARAMS
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def snapshot_root():
+    return os.fspath(settings.CATALOG_SNAPSHOT_DIR)
+
+
+def to_timestamp(value):
+    return (value - EPOCH) // MICROSECOND
+
+
+def from_timestamp(value):
+    return EPOCH + MICROSECOND * int(value)
+
+
+def build_snapshot():
+    """Выгрузить каталог в новый снимок и переключить на него ссылку current"""
+    root = snapshot_root()
+    os.makedirs(root, exist_ok=True)
+    
+    rows = list(Product.objects.order_by('id').values_list(*COLUMNS))
+    values = dict(zip(COLUMNS, zip(*rows))) if rows else {name: () for name in COLUMNS}
+    
+    stock_statuses = [value for value, _ in Product.STOCK_STATUS_CHOICES]
+    vocabularies = {
+        name: sorted({value for value in values[name] if value})
+        for name in VOCABULARY_COLUMNS
+    }
+    
+    columns = {}
+    for name, dtype in COLUMNS.items():
+        column = values[name]
+        if name in VOCABULARY_COLUMNS:
+            # Код 0 — пустое значение
+            codes = {value: code for code, value in enumerate(vocabularies[name], start=1)}
+            column = [codes.get(value, 0) for value in column]
+        elif name == 'stock_status':
+            column = [stock_statuses.index(value) for value in column]
+        elif name in DATETIME_COLUMNS:
+            column = [to_timestamp(value) for value in column]
+        elif dtype == 'f8':
+            column = [np.nan if value is None else float(value) for value in column]
+        columns[name] = np.array(column, dtype=dtype)
+    
+    meta = {
+        'built_at': time.time(),
+        'count': len(rows),
+        'stock_statuses': stock_statuses,
+        'vocabularies': vocabularies,
+        'categories': dict(Category.objects.values_list('slug', 'path')),
+        'category_paths': {
+            str(pk): path for pk, path in Category.objects.values_list('id', 'path')
+        },
+    }
+    
+    name = f'{int(time.time() * 1000)}-{os.getpid()}'
+    tmp_dir = os.path.join(root, f'.{name}')
+    os.makedirs(tmp_dir)
+    for column_name, column in columns.items():
+        np.save(os.path.join(tmp_dir, f'{column_name}.npy'), column)
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as meta_file:
+        json.dump(meta, meta_file)
+    os.rename(tmp_dir, os.path.join(root, name))
+    
+    # Атомарная подмена ссылки: воркеры видят либо старый, либо новый снимок целиком
+    tmp_link = os.path.join(root, f'.{CURRENT_LINK}-{name}')
+    os.symlink(name, tmp_link)
+    os.replace(tmp_link, os.path.join(root, CURRENT_LINK))
+    
+    _remove_old_snapshots(root, keep=name)
+    return name
+
+
+def _remove_old_snapshots(root, keep):
+    """Удалить устаревшие снимки (открытые воркерами файлы остаются доступны через mmap)"""
+    names = sorted(
+        (name for name in os.listdir(root) if not name.startswith('.') and name != CURRENT_LINK),
+        reverse=True
+    )
+    stale = [name for name in names if name != keep][KEEP_SNAPSHOTS - 1:]
+    for name in stale:
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+class CatalogSnapshot:
+    """Снимок каталога, открытый через mmap только для чтения"""
+    
+    def __init__(self, path):
+        self.name = os.path.basename(path)
+        with open(os.path.join(path, 'meta.json')) as meta_file:
+            self.meta = json.load(meta_file)
+        self.columns = {
+            name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+            for name in COLUMNS
+        }
+    
+    def __len__(self):
+        return self.meta['count']
+    
+    def filter_mask(self, data):
+        """Маска товаров по очищенным данным формы ProductFilter"""
+        columns = self.columns
+        mask = np.ones(len(self), dtype=bool)
+        
+        for filter_name, (column, lookup) in RANGE_FILTERS.items():
+            value = data.get(filter_name)
+            if value is not None:
+                if lookup == 'gte':
+                    mask &= columns[column] >= float(value)
+                else:
+                    mask &= columns[column] <= float(value)
+        
+        for column in VOCABULARY_COLUMNS:
+            value = data.get(column)
+            if value:
+                # icontains проверяется по словарю, а не по каждому товару
+                value = value.lower()
+                codes = [
+                    code
+                    for code, text in enumerate(self.meta['vocabularies'][column], start=1)
+                    if value in text.lower()
+                ]
+                mask &= np.isin(columns[column], codes)
+        
+        if data.get('category'):
+            path = self.meta['categories'].get(data['category'])
+            if path is None:
+                return np.zeros(len(self), dtype=bool)
+            category_ids = [
+                int(pk)
+                for pk, category_path in self.meta['category_paths'].items()
+                if category_path.startswith(path)
+            ]
+            mask &= np.isin(columns['category_id'], category_ids)
+        
+        if data.get('stock_status'):
+            mask &= columns['stock_status'] == self.meta['stock_statuses'].index(data['stock_status'])
+        
+        for flag in ('is_featured', 'is_new'):
+            if data.get(flag) is not None:
+                mask &= columns[flag] == data[flag]
+        
+        return mask
+    
+    def select(self, data, ordering):
+        """Отсортированные id товаров, прошедших фильтры"""
+        indexes = np.flatnonzero(self.filter_mask(data))
+        
+        # lexsort сортирует по последнему ключу в первую очередь; id — разрешитель
+        keys = [self.columns['id'][indexes]]
+        for field in reversed(ordering):
+            descending = field.startswith('-')
+            column = self.columns[field.lstrip('-')][indexes]
+            keys.append(-column if descending else column)
+        order = np.lexsort(keys)
+        
+        selected = indexes[order]
+        return SnapshotResult(
+            self.columns['id'][selected],
+            from_timestamp(self.columns['updated_at'][selected].max()) if len(selected) else None,
+            self.name
+        )
+
+
+class SnapshotResult:
+    """Отсортированные id из снимка; товары читаются из БД только для среза страницы"""
+    
+    def __init__(self, ids, last_modified, snapshot_name):
+        self.ids = ids
+        self.last_modified = last_modified
+        # Имя сборки: снимок публикуется позже смены версии каталога
+        self.snapshot_name = snapshot_name
+        self.queryset = Product.objects.none()
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError('SnapshotResult поддерживает только срезы')
+        ids = self.ids[index].tolist()
+        # Выборка может быть как моделями, так и строками .values()
+        products = {
+            row['id'] if isinstance(row, dict) else row.pk: row
+            for row in self.queryset.filter(pk__in=ids)
+        }
+        # Товар могли удалить после сборки снимка
+        return [products[pk] for pk in ids if pk in products]
+    
+    def with_queryset(self, queryset):
+        self.queryset = queryset
+        return self
+
+
+_current = None
+
+
+def get_snapshot():
+    """Актуальный снимок текущего процесса или None, если движок выключен или снимка нет"""
+    global _current
+    
+    if not settings.CATALOG_SNAPSHOT_ENABLED:
+        return None
+    link = os.path.join(snapshot_root(), CURRENT_LINK)
+    try:
+        name = os.readlink(link)
+    except OSError:
+        return None
+    if _current is None or _current.name != name:
+        try:
+            _current = CatalogSnapshot(os.path.join(snapshot_root(), name))
+        except (OSError, ValueError):
+            logger.warning('Не удалось открыть снимок каталога %s', name, exc_info=True)
+            return None
+    return _current
+
+
+def query_snapshot(query_params, ordering, queryset):
+    """Результат списка из снимка или None, если запрос ему не по силам"""
+    if not SUPPORTED_PARAMS.issuperset(query_params):
+        return None
+    snapshot = get_snapshot()
+    if snapshot is None:
+        return None
+    
+    filterset = ProductFilter(data=query_params, queryset=queryset)
+    if not filterset.is_valid():
+        # Ошибку валидации вернет обычный путь через БД
+        return None
+    return snapshot.select(filterset.form.cleaned_data, ordering).with_queryset(queryset)
+
+
+def rebuild_snapshot():
+    """Пересобрать снимок (задача из очереди)"""
+    cache.delete(SNAPSHOT_REBUILD_LOCK)
+    return build_snapshot()
+
+
+def schedule_snapshot_rebuild(countdown=5):
+    """Поставить пересборку снимка в очередь (не чаще одной на серию изменений)"""
+    from .tasks import rebuild_catalog_snapshot
+    
+    if settings.CATALOG_SNAPSHOT_ENABLED:
+        schedule_rebuild(rebuild_catalog_snapshot, SNAPSHOT_REBUILD_LOCK, countdown=countdown)
@@ -0,0 +1,88 @@
+# backend/products/specs.py
+"""Фильтры по Product.specifications и справочник их значений"""
+import json
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .models import Product, SpecificationOption
+
+
+# Параметры запроса вида ?spec.sheath=leather
+SPEC_PARAM_PREFIX = 'spec.'
+
+# Значения длиннее не попадают в справочник (это описания, а не варианты фильтра)
+MAX_OPTION_LENGTH = 255
+
+
+def spec_params(query_params):
+    """Ключи характеристик и выбранные значения из параметров запроса"""
+    return {
+        name[len(SPEC_PARAM_PREFIX):]: [value for value in query_params.getlist(name) if value]
+        for name in query_params
+        if name.startswith(SPEC_PARAM_PREFIX) and len(name) > len(SPEC_PARAM_PREFIX)
+    }
+
+
+def spec_q(key, values):
+    """Условие «характеристика key равна одному из values» через @> (GIN jsonb_path_ops)"""
+    condition = Q()
+    for value in values:
+        condition |= Q(specifications__contains={key: value})
+        # Числа и флаги в JSON хранятся без кавычек
+        try:
+            typed = json.loads(value)
+        except ValueError:
+            continue
+        if isinstance(typed, (bool, int, float)):
+            condition |= Q(specifications__contains={key: typed})
+    return condition
+
+
+def option_pairs(specifications):
+    """Пары ключ/значение, которые можно предложить в фильтре"""
+    if not isinstance(specifications, dict):
+        return []
+    pairs = []
+    for key, value in specifications.items():
+        if isinstance(value, (dict, list)) or value is None:
+            continue
+        if isinstance(value, bool):
+            value = json.dumps(value)
+        value = str(value)
+        if value and len(key) <= 100 and len(value) <= MAX_OPTION_LENGTH:
+            pairs.append((key, value))
+    return pairs
+
+
+def add_specification_options(*specifications):
+    """Дополнить справочник значениями сохраненных товаров"""
+    pairs = {pair for item in specifications for pair in option_pairs(item)}
+    if pairs:
+        SpecificationOption.objects.bulk_create(
+            [SpecificationOption(key=key, value=value) for key, value in pairs],
+            ignore_conflicts=True
+        )
+
+
+def rebuild_specification_options():
+    """Пересобрать справочник по всему каталогу (убирает значения, которых больше нет)"""
+    table = SpecificationOption._meta.db_table
+    products_table = Product._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table}')
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (key, value)
+            SELECT DISTINCT spec.key, spec.value
+            FROM {products_table} AS product,
+                 jsonb_each_text(product.specifications) AS spec
+            WHERE jsonb_typeof(product.specifications) = 'object'
+              AND jsonb_typeof(product.specifications -> spec.key) IN ('string', 'number', 'boolean')
+              AND spec.value <> ''
+              AND length(spec.key) <= 100
+              AND length(spec.value) <= %s
+            """,
+            [MAX_OPTION_LENGTH]
+        )
+        return cursor.rowcount
@@ -0,0 +1,104 @@
+# backend/products/tasks.py
+from celery import shared_task
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .counters import ack_pending_views, pop_pending_views
+from .cache import bump_catalog_version
+from .category_counts import reconcile_category_counts
+from .feeds import rebuild_feeds
+from .home import rebuild_home_payload
+from .importer import run_import_job
+from .models import Product
+from .popularity import recompute_popularity
+from .similarity import rebuild_similarity_index
+from .sitemap import rebuild_sitemaps
+from .snapshot import rebuild_snapshot, schedule_snapshot_rebuild
+from .specs import rebuild_specification_options
+
+
+@shared_task(ignore_result=True)
+def flush_product_views(batch_size=500):
+    """Перенести накопленные в Redis просмотры в Product.views_count"""
+    views = pop_pending_views()
+    if views:
+        items = list(views.items())
+        with transaction.atomic():
+            for start in range(0, len(items), batch_size):
+                batch = items[start:start + batch_size]
+                increments = Case(
+                    *[When(pk=pk, then=Value(count)) for pk, count in batch],
+                    default=Value(0),
+                    output_field=IntegerField()
+                )
+                Product.objects.filter(pk__in=[pk for pk, _ in batch]).update(
+                    views_count=F('views_count') + increments,
+                    # Недавние просмотры затухают в update_popularity_scores
+                    recent_views=F('recent_views') + increments
+                )
+    # Страница товара берет счетчик из Redis (get_view_count), кэш страниц не сбрасывается
+    totals = {}
+    if views:
+        totals = dict(Product.objects.filter(pk__in=list(views)).values_list('id', 'views_count'))
+    ack_pending_views(totals)
+    if views:
+        # Сортировка по просмотрам в снимке каталога
+        schedule_snapshot_rebuild()
+
+
+@shared_task(ignore_result=True)
+def rebuild_similar_products(k=12):
+    """Пересобрать индекс похожих товаров"""
+    rebuild_similarity_index(k=k)
+    bump_catalog_version()
+
+
+@shared_task(ignore_result=True)
+def rebuild_home_cache():
+    """Пересобрать данные главной страницы после изменений каталога"""
+    rebuild_home_payload()
+
+
+@shared_task(ignore_result=True)
+def rebuild_specification_catalog():
+    """Убрать из справочника характеристик значения, которых больше нет у товаров"""
+    rebuild_specification_options()
+    bump_catalog_version()
+
+
+@shared_task(ignore_result=True)
+def rebuild_catalog_snapshot():
+    """Пересобрать колоночный снимок каталога и переключить на него воркеры"""
+    rebuild_snapshot()
+
+
+@shared_task(ignore_result=True)
+def rebuild_product_feeds():
+    """Пересобрать файлы выгрузки для маркетплейсов"""
+    rebuild_feeds()
+
+
+@shared_task(ignore_result=True)
+def rebuild_sitemap():
+    """Переписать изменившиеся части sitemap"""
+    rebuild_sitemaps()
+
+
+@shared_task(ignore_result=True)
+def update_popularity_scores():
+    """Пересчитать оценку популярности для сортировки каталога по умолчанию"""
+    if recompute_popularity():
+        bump_catalog_version()
+        schedule_snapshot_rebuild()
+
+
+@shared_task(ignore_result=True)
+def reconcile_category_product_counts():
+    """Сверить счетчики товаров в категориях с БД"""
+    reconcile_category_counts()
+
+
+@shared_task(ignore_result=True)
+def import_catalog_file(job_id, path, filename, dry_run=False, download_images=True):
+    """Импорт каталога из файла, загруженного в админке"""
+    run_import_job(job_id, path, filename, dry_run=dry_run, download_images=download_images)
@@ -0,0 +1,132 @@
+"""Импорт каталога: сравнение строк с товарами, отказы строк, счетчики категорий"""
+import io
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+
+from products.importer import CatalogImporter, CatalogImportError
+from products.models import Category, PriceHistory, Product
+
+
+HEADER = 'sku,slug,name,price,category,stock_status'
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CatalogImporterTests(TestCase):
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.knives = Category.objects.create(name='Ножи', slug='knives')
+        cls.axes = Category.objects.create(name='Топоры', slug='axes')
+        cls.hunter = Product.objects.create(
+            name='Hunter', slug='hunter', sku='H-1', price=Decimal('1000'), category=cls.knives
+        )
+        cls.skinner = Product.objects.create(
+            name='Skinner', slug='skinner', price=Decimal('800'), category=cls.knives
+        )
+    
+    def run_import(self, *lines, **options):
+        content = '\n'.join([HEADER, *lines]).encode()
+        importer = CatalogImporter(download_images=False, **options)
+        return importer.run(io.BytesIO(content), 'catalog.csv')
+    
+    def test_creates_new_and_updates_changed_fields(self):
+        report = self.run_import(
+            'H-1,,Hunter,1200,knives,',
+            'S-2,,Scout,500,Ножи,',
+        )
+        
+        self.assertEqual(report.created, ['S-2'])
+        self.assertEqual(report.updated, {'H-1': ['price']})
+        self.assertEqual(report.errors, [])
+        self.hunter.refresh_from_db()
+        self.assertEqual(self.hunter.price, Decimal('1200'))
+        scout = Product.objects.get(sku='S-2')
+        self.assertEqual((scout.slug, scout.category_id), ('scout', self.knives.pk))
+        self.assertTrue(PriceHistory.objects.filter(
+            product=self.hunter, old_price=Decimal('1000'), new_price=Decimal('1200')
+        ).exists())
+    
+    def test_unchanged_row_is_not_written(self):
+        updated_at = self.hunter.updated_at
+        
+        report = self.run_import('H-1,,Hunter,"1000,00",knives,')
+        
+        self.assertEqual((report.created, report.updated, report.unchanged), ([], {}, 1))
+        self.hunter.refresh_from_db()
+        self.assertEqual(self.hunter.updated_at, updated_at)
+    
+    def test_matches_by_slug_when_sku_is_unknown(self):
+        report = self.run_import(
+            ',,Hunter,1100,knives,',
+            'SK-9,,Skinner,800,knives,',
+        )
+        
+        self.assertEqual(report.created, [])
+        self.assertEqual(report.updated, {'H-1': ['price'], 'SK-9': ['sku']})
+        self.skinner.refresh_from_db()
+        self.assertEqual(self.skinner.sku, 'SK-9')
+    
+    def test_slug_of_product_with_other_sku_is_rejected(self):
+        report = self.run_import('X-1,,Hunter,900,knives,')
+        
+        self.assertEqual(report.errors, [(2, 'slug hunter занят товаром с артикулом H-1')])
+        self.assertFalse(Product.objects.filter(sku='X-1').exists())
+        self.hunter.refresh_from_db()
+        self.assertEqual(self.hunter.price, Decimal('1000'))
+    
+    def test_invalid_rows_are_rejected_and_others_applied(self):
+        report = self.run_import(
+            'N-1,,Nomad,700,boats,',
+            'N-2,,Nessmuk,abc,knives,',
+            'N-3,,Neck,,knives,',
+            'N-4,,Nakiri,600,knives,',
+            'N-4,,Nakiri,650,knives,',
+            'N-5,,Nakiri,650,knives,',
+            'N-6,,Bushcraft,900,axes,',
+        )
+        
+        self.assertEqual([line for line, _ in report.errors], [2, 3, 4, 6, 7])
+        messages = dict(report.errors)
+        self.assertIn('category', messages[2])
+        self.assertIn('price', messages[3])
+        self.assertIn('price: обязательное поле для нового товара', messages[4])
+        self.assertIn('уже встречался в файле', messages[6])
+        self.assertIn('slug nakiri уже занят', messages[7])
+        self.assertEqual(report.created, ['N-4', 'N-6'])
+        self.assertEqual(
+            set(Product.objects.filter(sku__startswith='N-').values_list('sku', flat=True)),
+            {'N-4', 'N-6'}
+        )
+    
+    def test_dry_run_writes_nothing(self):
+        report = self.run_import(
+            'H-1,,Hunter,1200,knives,',
+            'S-2,,Scout,500,knives,',
+            dry_run=True
+        )
+        
+        self.assertEqual((report.created, report.updated), (['S-2'], {'H-1': ['price']}))
+        self.assertFalse(Product.objects.filter(sku='S-2').exists())
+        self.hunter.refresh_from_db()
+        self.assertEqual(self.hunter.price, Decimal('1000'))
+    
+    def test_category_counts_are_reconciled(self):
+        self.run_import(
+            'H-1,,Hunter,1000,axes,out_of_stock',
+            'S-2,,Scout,500,knives,in_stock',
+            'S-3,,Splitter,900,axes,in_stock',
+        )
+        
+        for category in Category.objects.all():
+            products = Product.objects.filter(category=category)
+            self.assertEqual(category.products_count, products.count(), category.slug)
+            self.assertEqual(
+                category.in_stock_count,
+                products.filter(stock_status='in_stock').count(),
+                category.slug
+            )
+    
+    def test_missing_required_columns(self):
+        with self.assertRaisesMessage(CatalogImportError, 'category'):
+            CatalogImporter(download_images=False).run(io.BytesIO(b'sku,name,price\nA,B,1'), 'catalog.csv')
@@ -0,0 +1,116 @@
+"""Курсорная пагинация каталога: обход страниц при разных сортировках и испорченные курсоры"""
+import base64
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+from urllib.parse import parse_qs, urlparse
+
+from django.test import TestCase, override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from products.models import Category, Product
+from products.pagination import ProductKeysetPagination
+
+
+LIST_URL = '/api/products/'
+
+
+def make_cursor(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ProductKeysetPaginationTests(TestCase):
+    
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Ножи', slug='knives')
+        # Повторяющиеся цены и оценки: порядок внутри них держит разрешитель id
+        for i, (price, rating, popularity) in enumerate([
+            (1000, '4.50', 3.0),
+            (500, '4.50', 1.0),
+            (1000, '3.00', 3.0),
+            (750, '5.00', 0.5),
+            (500, '0.00', 2.0),
+            (1200, '4.00', 1.0),
+            (750, '4.50', 2.0),
+        ]):
+            Product.objects.create(
+                name=f'Knife {i}',
+                slug=f'knife-{i}',
+                price=Decimal(price),
+                average_rating=Decimal(rating),
+                popularity_score=popularity,
+                category=category
+            )
+    
+    def setUp(self):
+        self.client = APIClient()
+    
+    def walk(self, ordering=None, page_size=2):
+        """id всех товаров, собранные переходами по ссылкам next"""
+        params = {'cursor': '', 'page_size': page_size}
+        if ordering:
+            params['ordering'] = ordering
+        response = self.client.get(LIST_URL, params)
+        ids = []
+        while True:
+            self.assertEqual(response.status_code, 200, response.content)
+            ids += [item['id'] for item in response.data['results']]
+            if response.data['next'] is None:
+                return ids
+            response = self.client.get(response.data['next'])
+    
+    def expected(self, *ordering):
+        tiebreaker = '-id' if ordering[-1].startswith('-') else 'id'
+        return list(Product.objects.order_by(*ordering, tiebreaker).values_list('id', flat=True))
+    
+    def test_pages_follow_ordering(self):
+        cases = [
+            ('price', ['price']),
+            ('-price', ['-price']),
+            ('price,-average_rating', ['price', '-average_rating']),
+            ('-average_rating,price', ['-average_rating', 'price']),
+            ('-price,created_at', ['-price', 'created_at']),
+            (None, ['-popularity_score', '-created_at']),
+        ]
+        for ordering, fields in cases:
+            for page_size in (1, 2, 3):
+                with self.subTest(ordering=ordering, page_size=page_size):
+                    self.assertEqual(self.walk(ordering, page_size), self.expected(*fields))
+    
+    def test_cursor_round_trip(self):
+        paginator = ProductKeysetPagination()
+        paginator.ordering = ['-price', 'created_at', 'id']
+        created_at = datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+        cursor = paginator.encode_cursor([Decimal('1250.50'), created_at, 42])
+        
+        self.assertNotIn('=', cursor)
+        request = Request(APIRequestFactory().get(LIST_URL, {'cursor': cursor}))
+        self.assertEqual(
+            paginator.decode_cursor(request, Product.objects.all()),
+            [Decimal('1250.50'), created_at, 42]
+        )
+    
+    def test_tampered_cursors_are_rejected(self):
+        first = self.client.get(LIST_URL, {'cursor': '', 'ordering': 'price', 'page_size': 2})
+        first_cursor = parse_qs(urlparse(first.data['next']).query)['cursor'][0]
+        payload = json.loads(base64.urlsafe_b64decode(first_cursor + '=' * (-len(first_cursor) % 4)))
+        
+        cursors = {
+            'not base64': '!!!',
+            'not json': base64.urlsafe_b64encode(b'{oops').decode(),
+            'other ordering': make_cursor({**payload, 'o': ['-price', '-id']}),
+            'short position': make_cursor({**payload, 'p': payload['p'][:1]}),
+            'bad value': make_cursor({**payload, 'p': ['дорого', payload['p'][1]]}),
+            'no position': make_cursor({'o': payload['o']}),
+        }
+        for name, cursor in cursors.items():
+            with self.subTest(name):
+                response = self.client.get(LIST_URL, {'cursor': cursor, 'ordering': 'price', 'page_size': 2})
+                self.assertEqual(response.status_code, 404)
+        
+        # Настоящий курсор не подходит к запросу с другой сортировкой
+        response = self.client.get(LIST_URL, {'cursor': first_cursor, 'ordering': '-price'})
+        self.assertEqual(response.status_code, 404)
@@ -1,12 +1,13 @@
 # backend/products/urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CategoryViewSet, ProductViewSet
+from .views import CategoryViewSet, ProductFeedView, ProductViewSet
 
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet, basename='category')
 router.register(r'', ProductViewSet, basename='product')
 
 urlpatterns = [
+    path('feed.<str:fmt>', ProductFeedView.as_view(), name='product-feed'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -0,0 +1,27 @@
+# backend/products/utils.py
+import os
+import tempfile
+
+
+def absolutize_urls(request, items, field='main_image'):
+    """Превратить относительные URL медиафайлов в абсолютные для закэшированных данных"""
+    return [
+        {**item, field: request.build_absolute_uri(item[field]) if item.get(field) else item.get(field)}
+        for item in items
+    ]
+
+
+def write_atomic(path, chunks, encoding='utf-8'):
+    """Записать файл по частям и подменить его целиком (читатели не видят недописанный файл)"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'w', encoding=encoding, newline='') as tmp_file:
+            for chunk in chunks:
+                tmp_file.write(chunk)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
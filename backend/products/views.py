@@ -1,47 +1,210 @@
 # backend/products/views.py
-from rest_framework import viewsets, filters
+import os
+import re
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from urllib.parse import urlencode
+
+from rest_framework import viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db.models import Count, F, Max, Q
+from django.db.models.functions import Abs, Greatest
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.views import View
+from django.shortcuts import get_object_or_404
 
+from .cache import catalog_cache_key, get_catalog_version
+from .compare import get_comparison
+from .conditional import make_etag, not_modified_response, set_validators
+from .counters import get_recently_viewed, get_view_count, record_view, remember_visitor
+from .detail import get_product_detail
+from .facets import build_facets
+from .feeds import FEED_FORMATS, feed_path, schedule_feeds_rebuild, stream_feed
+from .home import get_home_payload
 from .models import Category, Product
+from .snapshot import query_snapshot
+from .pricing import reprice
 from .serializers import (
-    CategorySerializer,
+    CategoryTreeSerializer,
     ProductListSerializer,
-    ProductDetailSerializer
+    ProductDetailSerializer,
+    RepriceSerializer
 )
-from .filters import ProductFilter
+from .filters import ProductFilter, ProductOrderingFilter, ProductSearchFilter
+from .pagination import ProductKeysetPagination
+from .projections import ProductListProjection, get_product_cards
+from .sitemap import INDEX_NAME, SITEMAP_NAME_RE, schedule_sitemap_rebuild, sitemap_path
+from .utils import absolutize_urls
 
 
 class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     """API для категорий"""
     queryset = Category.objects.filter(parent=None)  # Только корневые категории
-    serializer_class = CategorySerializer
+    serializer_class = CategoryTreeSerializer
     lookup_field = 'slug'
+    
+    def get_tree_validators(self, request):
+        """ETag и Last-Modified дерева категорий без его сериализации"""
+        state = Category.objects.aggregate(last_modified=Max('updated_at'), count=Count('id'))
+        etag = make_etag(
+            'categories',
+            state['count'],
+            state['last_modified'],
+            request.get_full_path()
+        )
+        return etag, state['last_modified']
+    
+    def list(self, request, *args, **kwargs):
+        """Всё дерево категорий из одной выборки"""
+        etag, last_modified = self.get_tree_validators(request)
+        response = not_modified_response(request, etag, last_modified)
+        if response is not None:
+            return response
+        
+        children_map = Category.get_children_map()
+        roots = children_map.get(None, [])
+        
+        context = self.get_serializer_context()
+        context['category_children'] = children_map
+        
+        page = self.paginate_queryset(roots)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True, context=context)
+            response = self.get_paginated_response(serializer.data)
+        else:
+            serializer = self.get_serializer(roots, many=True, context=context)
+            response = Response(serializer.data)
+        return set_validators(response, etag, last_modified)
+    
+    def retrieve(self, request, *args, **kwargs):
+        """Категория с вложенными подкатегориями; валидаторы общие со всем деревом"""
+        etag, last_modified = self.get_tree_validators(request)
+        response = not_modified_response(request, etag, last_modified)
+        if response is not None:
+            return response
+        return set_validators(super().retrieve(request, *args, **kwargs), etag, last_modified)
 
 
 class ProductViewSet(viewsets.ReadOnlyModelViewSet):
     """API для товаров"""
-    queryset = Product.objects.select_related('category').prefetch_related('images')
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    queryset = Product.objects.select_related('category', 'main_image')
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, ProductOrderingFilter]
     filterset_class = ProductFilter
-    search_fields = ['name', 'description', 'blade_material', 'handle_material']
-    ordering_fields = ['price', 'created_at', 'views_count', 'average_rating']
-    ordering = ['-created_at']
+    ordering_fields = ['price', 'created_at', 'views_count', 'average_rating', 'popularity_score']
+    # По умолчанию «по популярности» (индекс product_popularity_idx)
+    ordering = ['-popularity_score', '-created_at']
     lookup_field = 'slug'
+    keyset_pagination_class = ProductKeysetPagination
+    
+    # Похожие товары
+    similar_limit = 6
+    similar_cache_timeout = 60 * 60
+    
+    # Покупают вместе
+    bought_together_limit = 4
+    
+    # Подсказки поиска
+    suggest_min_length = 2
+    suggest_max_length = 100
+    suggest_limit = 8
+    suggest_cache_timeout = 60 * 10
+    
+    # Пакетная выборка карточек
+    batch_max_size = 100
+    
+    # Сравнение товаров
+    compare_max_size = 6
+    
+    # Фасеты фильтров
+    facets_histogram_bins = 10
+    facets_cache_timeout = 60 * 10
+    facets_ignored_params = {'page', 'page_size', 'ordering', 'fields'}
+    
+    @property
+    def paginator(self):
+        """Курсорная пагинация по запросу: ?cursor= (пустой курсор — первая страница)"""
+        if not hasattr(self, '_paginator'):
+            if self.keyset_pagination_class.cursor_query_param in self.request.query_params:
+                self._paginator = self.keyset_pagination_class()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
     
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return ProductDetailSerializer
         return ProductListSerializer
     
+    def list(self, request, *args, **kwargs):
+        """Список товаров; 304, если выборка не менялась с прошлого запроса"""
+        queryset = self.get_queryset()
+        # Строки страницы читаются через .values() и собираются без ModelSerializer
+        projection = ProductListProjection(request)
+        
+        # Фильтры и сортировка из колоночного снимка, если он включен и запрос ему по силам
+        ordering = ProductOrderingFilter().get_ordering(request, queryset, self)
+        snapshot_result = query_snapshot(request.query_params, ordering, projection.values(queryset))
+        if snapshot_result is not None:
+            queryset = snapshot_result
+            last_modified = snapshot_result.last_modified
+            source = snapshot_result.snapshot_name
+        else:
+            queryset = projection.values(self.filter_queryset(queryset))
+            last_modified = None
+            source = 'db'
+        
+        # Без агрегата по выборке: версия каталога меняется при любом изменении товаров
+        # и категорий, а также при пересчете популярности и рейтингов. Просмотры
+        # переносятся в БД без смены версии, поэтому сортировка по ним без валидаторов.
+        # Снимок пересобирается с задержкой после смены версии, поэтому в ETag входит
+        # и имя сборки: ответ из устаревшего снимка не закрепится за новой версией
+        etag = None
+        if not any(field.lstrip('-') == 'views_count' for field in ordering or []):
+            params = sorted(
+                (name, value)
+                for name, values in request.query_params.lists()
+                for value in values
+            )
+            etag = make_etag(
+                'products', get_catalog_version(), source, request.get_host(), urlencode(params)
+            )
+            response = not_modified_response(request, etag, last_modified)
+            if response is not None:
+                return response
+        
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            response = self.get_paginated_response(projection.serialize(page))
+        else:
+            response = Response(projection.serialize(queryset))
+        return set_validators(response, etag, last_modified)
+    
     def retrieve(self, request, *args, **kwargs):
-        """Увеличить счетчик просмотров при получении детальной информации"""
-        instance = self.get_object()
-        instance.increment_views()
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        """Детальная информация из кэша; просмотр учитывается в Redis отдельно от тела ответа"""
+        detail = get_product_detail(kwargs[self.lookup_field])
+        if detail is None:
+            raise Http404
+        record_view(request, detail['id'])
+        
+        response = not_modified_response(request, detail['etag'], detail['updated_at'])
+        if response is not None:
+            return remember_visitor(request, response)
+        
+        data = {
+            **detail['data'],
+            'views_count': get_view_count(detail['id'], detail['views_count']),
+            'images': absolutize_urls(request, detail['data']['images'], field='image'),
+        }
+        response = set_validators(Response(data), detail['etag'], detail['updated_at'])
+        return remember_visitor(request, response)
     
     @action(detail=False, methods=['get'])
     def featured(self, request):
@@ -59,18 +222,233 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
     
     @action(detail=True, methods=['get'])
     def similar(self, request, slug=None):
-        """Похожие товары"""
-        product = self.get_object()
+        """Похожие товары из индекса, который пересобирает задача rebuild_similar_products"""
+        cache_key = catalog_cache_key('similar', request.build_absolute_uri('/'), slug)
+        data = cache.get(cache_key)
+        if data is None:
+            product = get_object_or_404(Product.objects.only('id', 'category_id', 'price'), slug=slug)
+            similar_products = self.queryset.filter(
+                similar_to__product=product
+            ).order_by('similar_to__rank')[:self.similar_limit]
+            
+            if not similar_products:
+                # Товар еще не попал в индекс: та же категория, ближайшие по цене
+                similar_products = self.queryset.filter(
+                    category_id=product.category_id,
+                    price__gte=product.price * Decimal('0.7'),
+                    price__lte=product.price * Decimal('1.3')
+                ).exclude(id=product.id).order_by(
+                    Abs(F('price') - product.price), 'id'
+                )[:self.similar_limit]
+            
+            data = self.get_serializer(similar_products, many=True).data
+            cache.set(cache_key, data, self.similar_cache_timeout)
+        return Response(data)
+    
+    @action(detail=False, methods=['get'])
+    def suggest(self, request):
+        """Подсказки для строки поиска (с учетом опечаток)"""
+        query = ' '.join(request.query_params.get('q', '').split()).lower()
+        query = query[:self.suggest_max_length]
+        if len(query) < self.suggest_min_length:
+            return Response([])
+        
+        cache_key = catalog_cache_key('suggest', query)
+        suggestions = cache.get(cache_key)
+        if suggestions is None:
+            # Поиск по триграммным GIN-индексам названия и материалов.
+            # Подстрока ищется через ~* (регистронезависимо, индекс его обслуживает),
+            # а не icontains: UPPER(name) LIKE ... индексом не покрыт
+            rows = Product.objects.filter(
+                Q(name__iregex=re.escape(query))
+                | Q(name__trigram_word_similar=query)
+                | Q(blade_material__trigram_word_similar=query)
+                | Q(handle_material__trigram_word_similar=query)
+            ).annotate(
+                similarity=Greatest(
+                    TrigramWordSimilarity(query, 'name'),
+                    TrigramWordSimilarity(query, 'blade_material'),
+                    TrigramWordSimilarity(query, 'handle_material'),
+                )
+            ).order_by('-similarity', 'name').values(
+                'id', 'name', 'slug', 'main_image__image'
+            )[:self.suggest_limit]
+            
+            suggestions = [
+                {
+                    'id': row['id'],
+                    'name': row['name'],
+                    'slug': row['slug'],
+                    'thumbnail': (
+                        default_storage.url(row['main_image__image'])
+                        if row['main_image__image'] else None
+                    ),
+                }
+                for row in rows
+            ]
+            cache.set(cache_key, suggestions, self.suggest_cache_timeout)
+        
+        return Response([
+            {
+                **suggestion,
+                'thumbnail': (
+                    request.build_absolute_uri(suggestion['thumbnail'])
+                    if suggestion['thumbnail'] else None
+                ),
+            }
+            for suggestion in suggestions
+        ])
+    
+    @action(detail=False, methods=['get'])
+    def batch(self, request):
+        """Карточки товаров по ?ids= или ?slugs= в запрошенном порядке (просмотры не учитываются)"""
+        if request.query_params.get('ids'):
+            lookup = 'id'
+            try:
+                values = [int(value) for value in request.query_params['ids'].split(',') if value.strip()]
+            except ValueError:
+                raise ValidationError({'ids': 'Ожидается список id через запятую'})
+        elif request.query_params.get('slugs'):
+            lookup = 'slug'
+            values = [value.strip() for value in request.query_params['slugs'].split(',') if value.strip()]
+        else:
+            raise ValidationError({'ids': 'Укажите ids или slugs'})
+        
+        values = list(dict.fromkeys(values))
+        if len(values) > self.batch_max_size:
+            raise ValidationError({lookup + 's': f'Не больше {self.batch_max_size} товаров за запрос'})
+        
+        projection = ProductListProjection(request)
+        cards = get_product_cards(request, lookup, values)
+        items = absolutize_urls(request, [cards[value] for value in values if value in cards])
+        return Response([projection.pick(item) for item in items])
+    
+    @action(detail=True, methods=['get'], url_path='bought-together')
+    def bought_together(self, request, slug=None):
+        """Товары, которые покупают вместе с данным (индекс задачи update_bought_together_pairs)"""
+        queryset = Product.objects.filter(
+            bought_with__product__slug=slug
+        ).order_by('bought_with__rank')[:self.bought_together_limit]
+        projection = ProductListProjection(request)
+        return Response(projection.serialize(projection.values(queryset)))
+    
+    @action(detail=False, methods=['get'], url_path='recently-viewed')
+    def recently_viewed(self, request):
+        """Недавно просмотренные товары посетителя (?exclude= — id текущего товара)"""
+        ids = get_recently_viewed(request)
+        exclude = request.query_params.get('exclude', '')
+        if exclude.isdigit():
+            ids = [pk for pk in ids if pk != int(exclude)]
+        
+        projection = ProductListProjection(request)
+        cards = get_product_cards(request, 'id', ids)
+        items = absolutize_urls(request, [cards[pk] for pk in ids if pk in cards])
+        return remember_visitor(request, Response([projection.pick(item) for item in items]))
+    
+    @action(detail=False, methods=['get'])
+    def compare(self, request):
+        """Таблица сравнения товаров ?ids= с отметкой различающихся характеристик"""
+        try:
+            ids = [int(value) for value in request.query_params.get('ids', '').split(',') if value.strip()]
+        except ValueError:
+            raise ValidationError({'ids': 'Ожидается список id через запятую'})
+        
+        ids = list(dict.fromkeys(ids))
+        if len(ids) < 2:
+            raise ValidationError({'ids': 'Для сравнения нужно минимум два товара'})
+        if len(ids) > self.compare_max_size:
+            raise ValidationError({'ids': f'Не больше {self.compare_max_size} товаров за запрос'})
+        
+        comparison = get_comparison(request, ids)
+        comparison['products'] = absolutize_urls(request, comparison['products'])
+        return Response(comparison)
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def reprice(self, request):
+        """Изменить цены товаров, отобранных фильтрами списка (?category=... и т. п.)"""
+        serializer = RepriceSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        queryset = self.filter_queryset(self.get_queryset())
+        updated = reprice(queryset, user=request.user, **serializer.validated_data)
+        return Response({'updated': updated})
+    
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """Счетчики значений и диапазоны для фильтров каталога"""
+        params = sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            if name not in self.facets_ignored_params
+            for value in values
+        )
+        cache_key = catalog_cache_key('facets', urlencode(params))
+        facets = cache.get(cache_key)
+        if facets is None:
+            queryset = self.filter_queryset(self.get_queryset())
+            facets = build_facets(queryset, bins=self.facets_histogram_bins, filtered=bool(params))
+            cache.set(cache_key, facets, self.facets_cache_timeout)
+        return Response(facets)
+
+
+class HomeView(APIView):
+    """Все данные главной страницы одним ответом из кэша"""
+    
+    def get(self, request):
+        payload = get_home_payload()
+        return Response({
+            'hero': absolutize_urls(request, payload['hero']),
+            'new_arrivals': absolutize_urls(request, payload['new_arrivals']),
+            'categories': payload['categories'],
+        })
+
+
+class ProductFeedView(View):
+    """Выгрузка каталога (YML/CSV) из готового файла с Last-Modified"""
+    
+    def get(self, request, fmt):
+        if fmt not in FEED_FORMATS:
+            raise Http404
+        filename, content_type = FEED_FORMATS[fmt]
+        path = feed_path(fmt)
+        
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            # Файл еще не собран: отдаем потоком и ставим сборку в очередь
+            schedule_feeds_rebuild(countdown=0)
+            return StreamingHttpResponse(stream_feed(fmt), content_type=content_type)
+        
+        etag = make_etag('feed', fmt, stat.st_mtime_ns, stat.st_size)
+        last_modified = datetime.fromtimestamp(stat.st_mtime, tz=dt_timezone.utc)
+        response = not_modified_response(request, etag, last_modified)
+        if response is not None:
+            return response
+        
+        response = FileResponse(open(path, 'rb'), content_type=content_type, filename=filename)
+        return set_validators(response, etag, last_modified)
+
+
+class SitemapView(View):
+    """Индекс и части sitemap из готовых файлов; поисковые роботы не обращаются к БД"""
+    
+    def get(self, request, name=INDEX_NAME):
+        if not SITEMAP_NAME_RE.fullmatch(name):
+            raise Http404
+        path = sitemap_path(name)
         
-        # Похожие товары из той же категории, в близком ценовом диапазоне
-        price_min = product.price * 0.7
-        price_max = product.price * 1.3
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            # Sitemap еще не собран (или части уже нет)
+            if name == INDEX_NAME:
+                schedule_sitemap_rebuild(countdown=0)
+            raise Http404
         
-        similar_products = Product.objects.filter(
-            category=product.category,
-            price__gte=price_min,
-            price__lte=price_max
-        ).exclude(id=product.id).order_by('?')[:6]
+        etag = make_etag('sitemap', name, stat.st_mtime_ns, stat.st_size)
+        last_modified = datetime.fromtimestamp(stat.st_mtime, tz=dt_timezone.utc)
+        response = not_modified_response(request, etag, last_modified)
+        if response is not None:
+            return response
         
-        serializer = self.get_serializer(similar_products, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        response = FileResponse(open(path, 'rb'), content_type='application/xml; charset=utf-8')
+        return set_validators(response, etag, last_modified)
@@ -1,7 +1,9 @@
 # backend/reviews/admin.py
 from django.contrib import admin
+from django.db import transaction
 from django.utils.html import format_html
 from .models import Review, ReviewImage, ReviewHelpful
+from .ratings import adjust_product_ratings
 
 
 class ReviewImageInline(admin.TabularInline):
@@ -55,7 +57,15 @@ class ReviewAdmin(admin.ModelAdmin):
     actions = ['approve_reviews', 'mark_as_verified']
     
     def approve_reviews(self, request, queryset):
-        updated = queryset.update(is_approved=True)
+        # queryset.update обходит сигналы — вклад новых одобренных отзывов добавляется явно
+        with transaction.atomic():
+            pending = queryset.filter(is_approved=False).select_for_update()
+            changes = [
+                (product_id, rating, 1)
+                for product_id, rating in pending.values_list('product_id', 'rating')
+            ]
+            updated = pending.update(is_approved=True)
+            adjust_product_ratings(changes)
         self.message_user(request, f'Одобрено отзывов: {updated}')
     approve_reviews.short_description = 'Одобрить выбранные отзывы'
     
@@ -60,14 +60,6 @@ class Review(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.product.name} ({self.rating}★)"
     
-    def save(self, *args, **kwargs):
-        is_new = self.pk is None
-        super().save(*args, **kwargs)
-        
-        # Обновить средний рейтинг товара при одобрении
-        if self.is_approved:
-            self.product.update_rating()
-    
     def increment_helpful(self):
         """Увеличить счетчик 'Полезно'"""
         self.helpful_count += 1
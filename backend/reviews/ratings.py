@@ -0,0 +1,129 @@
+# backend/reviews/ratings.py
+"""
+Статистика оценок товара: сумма, количество и число оценок по звездам.
+
+Сигналы отзыва сдвигают счетчики через F() одним UPDATE (одобрение, снятие
+одобрения, смена оценки, удаление); average_rating выводится из новых суммы
+и количества в том же UPDATE, поэтому отзывы не агрегируются.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import (
+    Case, Count, DecimalField, F, IntegerField, Q, Sum, Value, When
+)
+from django.db.models.functions import Cast, Coalesce, Greatest, NullIf, Round
+from django.utils import timezone
+
+from products.models import Product
+
+from .models import Review
+
+
+STARS = range(1, 6)
+STAR_FIELDS = [f'rating_count_{stars}' for stars in STARS]
+COUNT_FIELDS = ['rating_sum', 'rating_count', *STAR_FIELDS]
+RATING_FIELDS = [*COUNT_FIELDS, 'average_rating']
+AVERAGE_PLACES = Product._meta.get_field('average_rating').decimal_places
+
+
+def _increments(counter):
+    return Case(
+        *[When(pk=pk, then=Value(delta)) for pk, delta in counter.items()],
+        default=Value(0),
+        output_field=IntegerField()
+    )
+
+
+def _average(rating_sum, rating_count):
+    """Средняя оценка как выражение БД; 0 без оценок"""
+    return Coalesce(
+        Round(
+            Cast(rating_sum, DecimalField(max_digits=12, decimal_places=2)) / NullIf(rating_count, Value(0)),
+            AVERAGE_PLACES
+        ),
+        Value(0),
+        output_field=DecimalField()
+    )
+
+
+def adjust_product_ratings(changes):
+    """
+    Сдвинуть статистику по изменениям [(product_id, rating, +1 или -1), ...].
+    
+    Все затронутые товары обновляются одним UPDATE; страницы товаров
+    и кэш каталога сбрасываются после фиксации.
+    """
+    from products.detail import invalidate_product_details_by_id
+    from products.signals import catalog_committed
+    
+    deltas = defaultdict(Counter)
+    for product_id, rating, sign in changes:
+        deltas['rating_sum'][product_id] += rating * sign
+        deltas['rating_count'][product_id] += sign
+        deltas[f'rating_count_{rating}'][product_id] += sign
+    
+    values = {}
+    ids = set()
+    for field, counter in deltas.items():
+        counter = {pk: delta for pk, delta in counter.items() if delta}
+        if counter:
+            values[field] = Greatest(F(field) + _increments(counter), Value(0))
+            ids.update(counter)
+    if not values:
+        return
+    
+    # В UPDATE справа F() — значения до изменения, поэтому средняя считается от новых выражений
+    values['average_rating'] = _average(
+        values.get('rating_sum', F('rating_sum')),
+        values.get('rating_count', F('rating_count'))
+    )
+    Product.objects.filter(pk__in=ids).update(**values, updated_at=timezone.now())
+    invalidate_product_details_by_id(ids)
+    transaction.on_commit(catalog_committed)
+
+
+def reconcile_product_ratings(product_ids=None):
+    """
+    Пересчитать статистику по одобренным отзывам одним группирующим запросом.
+    
+    Без product_ids сверяются все товары. Возвращает число исправленных.
+    """
+    from products.detail import invalidate_product_details_by_id
+    from products.signals import catalog_committed
+    
+    reviews = Review.objects.filter(is_approved=True)
+    products = Product.objects.all()
+    if product_ids is not None:
+        reviews = reviews.filter(product_id__in=product_ids)
+        products = products.filter(pk__in=product_ids)
+    
+    expected = {
+        row.pop('product_id'): row
+        for row in reviews.order_by().values('product_id').annotate(
+            rating_sum=Sum('rating'),
+            rating_count=Count('id'),
+            **{f'rating_count_{stars}': Count('id', filter=Q(rating=stars)) for stars in STARS}
+        )
+    }
+    empty = dict.fromkeys(COUNT_FIELDS, 0)
+    
+    now = timezone.now()
+    changed = []
+    for product in products.only('id', 'slug', *RATING_FIELDS):
+        values = expected.get(product.id, empty)
+        if any(getattr(product, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(product, field, value)
+            product.updated_at = now
+            changed.append(product)
+    if changed:
+        ids = [product.id for product in changed]
+        with transaction.atomic():
+            Product.objects.bulk_update(changed, [*COUNT_FIELDS, 'updated_at'])
+            Product.objects.filter(pk__in=ids).update(
+                average_rating=_average(F('rating_sum'), F('rating_count'))
+            )
+        invalidate_product_details_by_id(ids)
+        transaction.on_commit(catalog_committed)
+    return len(changed)
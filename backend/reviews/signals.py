@@ -0,0 +1,46 @@
+# backend/reviews/signals.py
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Review
+from .ratings import adjust_product_ratings
+
+
+# Поля отзыва, от которых зависит статистика оценок товара
+RATING_SOURCE_FIELDS = {'is_approved', 'rating', 'product', 'product_id'}
+
+
+def rating_contribution(product_id, rating, is_approved):
+    """Вклад отзыва в статистику: [(product_id, rating)] для одобренного, иначе []"""
+    return [(product_id, rating)] if is_approved else []
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_state(sender, instance, update_fields=None, **kwargs):
+    """Прежний вклад отзыва; «Полезно» и правка текста статистику не трогают"""
+    instance._previous_contribution = None
+    if instance.pk and (update_fields is None or RATING_SOURCE_FIELDS.intersection(update_fields)):
+        previous = Review.objects.filter(pk=instance.pk).values_list(
+            'product_id', 'rating', 'is_approved'
+        ).first()
+        if previous:
+            instance._previous_contribution = rating_contribution(*previous)
+
+
+@receiver(post_save, sender=Review)
+def review_rating_changed(sender, instance, created, **kwargs):
+    """Одобрение, снятие одобрения и смена оценки сдвигают статистику товара"""
+    previous = [] if created else getattr(instance, '_previous_contribution', None)
+    if previous is None:
+        return
+    current = rating_contribution(instance.product_id, instance.rating, instance.is_approved)
+    if previous != current:
+        adjust_product_ratings(
+            [(*item, -1) for item in previous] + [(*item, 1) for item in current]
+        )
+
+
+@receiver(post_delete, sender=Review)
+def review_rating_deleted(sender, instance, **kwargs):
+    if instance.is_approved:
+        adjust_product_ratings([(instance.product_id, instance.rating, -1)])